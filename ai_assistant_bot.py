@@ -1,13 +1,19 @@
 import os
 import asyncio
+import random
+import hashlib
+import itertools
+from concurrent.futures import ThreadPoolExecutor
 import subprocess
 import tempfile
+import threading
 import logging
 import re
+import shutil
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Tuple
+from collections import OrderedDict
 import json
-import base64
 import mimetypes
 from urllib.parse import urlparse
 from io import BytesIO
@@ -21,8 +27,20 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.error import TimedOut
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters, ContextTypes
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 
+try:
+    import orjson
+except ImportError:  # orjson необязателен — без него работаем на stdlib json
+    orjson = None
+
+try:
+    from pybase64 import b64decode, b64encode
+except ImportError:  # pybase64 (SIMD base64) необязателен — без него работаем на stdlib base64
+    from base64 import b64decode, b64encode
+
 # Настройка логирования
 logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
@@ -57,10 +75,108 @@ logging.getLogger().addFilter(_RedactDataImageLogFilter())
 logging.getLogger("httpx").setLevel(logging.WARNING)
 logging.getLogger("telegram.ext").setLevel(logging.WARNING)
 
+
+def _json_loads(raw):
+    """Парсит JSON из bytes/str (orjson, если установлен). Ошибки — json.JSONDecodeError."""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def _json_dumps(obj) -> bytes:
+    """Сериализует тело запроса сразу в bytes для requests (orjson, если установлен)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+# Инлайн-Markdown одним проходом: альтернативы в порядке приоритета, у каждой своя именованная группа.
+# Курсив не начинается/заканчивается на ** и __, чтобы не съедать разметку жирного внутри.
+_INLINE_MD_RE = re.compile(
+    r'\*{3}(?P<bi>.+?)\*{3}'
+    r'|\*{2}(?P<b>.+?)\*{2}'
+    r'|__(?P<bu>.+?)__'
+    r'|(?<![\w*])\*(?!\*)(?P<i>.+?)(?<!\*)\*(?![\w*])'
+    r'|(?<![\w_])_(?!_)(?P<iu>.+?)(?<!_)_(?![\w_])'
+    r'|~~(?P<s>.+?)~~'
+    r'|`(?P<code>.+?)`'
+    r'|\[(?P<link>[^\]]+)\]\([^\)]+\)'
+)
+
+# Подстроки, без которых ни одна альтернатива _INLINE_MD_RE не может совпасть
+_INLINE_MD_MARKERS = ('*', '_', '~~', '`', '](')
+
+_INLINE_MD_TAGS = {
+    'bi': ('<b><i>', '</i></b>'),
+    'b': ('<b>', '</b>'),
+    'bu': ('<b>', '</b>'),
+    'i': ('<i>', '</i>'),
+    'iu': ('<i>', '</i>'),
+    's': ('<s>', '</s>'),
+}
+
+
+# MIME-тип по первым 4 байтам файла; None — RIFF-контейнер, формат уточняется по байтам 8..12
+_IMAGE_MIME_BY_SIGNATURE = {
+    b'\x89PNG': "image/png",
+    b'GIF8': "image/gif",
+    b'RIFF': None,
+}
+
+# Таймкод сегмента в выводе Whisper: [MM:SS.mmm --> MM:SS.mmm], для длинных записей с часами.
+# Группы — конечное время (часы необязательны).
+_WHISPER_TIMESTAMP_RE = re.compile(
+    r'\[(?:\d+:)?\d{1,2}:\d{2}\.\d{3}\s*-->\s*(?:(\d+):)?(\d{1,2}):(\d{2})\.(\d{3})\]'
+)
+
+# Заголовок base64 data URL изображения (сами данные не захватываются)
+_DATA_URL_HEAD_RE = re.compile(r'data:image/(\w+);base64,')
+
+# Маркеры того, что Whisper не смог обработать файл; ищутся прямо в байтах лога
+_WHISPER_FAIL_RE = re.compile(rb"Skipping|Failed to load audio")
+
+# Первый http(s)-URL в тексте ответа модели
+_URL_RE = re.compile(r'https?://\S+')
+
+
+def _image_data_url(mime_type: str, encoded: bytes) -> str:
+    """Собирает data:<mime>;base64,<...> из байтов base64 одним decode.
+
+    Префикс и данные копируются в заранее выделенный bytearray, строка создаётся
+    один раз — без промежуточной str с base64 и её второй копии в f-строке.
+    """
+    prefix = f"data:{mime_type};base64,".encode('ascii')
+    buf = bytearray(len(prefix) + len(encoded))
+    buf[:len(prefix)] = prefix
+    buf[len(prefix):] = encoded
+    return buf.decode('ascii')
+
+
+def _image_digest(image_data: bytes) -> bytes:
+    """Короткий blake2b-дайджест изображения для поиска повторов в запросе."""
+    return hashlib.blake2b(image_data, digest_size=16).digest()
+
+
+def _inline_md_replace(match: re.Match) -> str:
+    """Заменяет одно совпадение _INLINE_MD_RE на HTML; вложенная разметка обрабатывается рекурсивно."""
+    kind = match.lastgroup
+    inner = match.group(kind)
+    if kind == 'code':
+        return f'<code>{inner}</code>'
+    inner = _INLINE_MD_RE.sub(_inline_md_replace, inner)
+    if kind == 'link':
+        # Ссылки [text](url) → просто text (Telegram HTML ссылки сложнее)
+        return inner
+    open_tag, close_tag = _INLINE_MD_TAGS[kind]
+    return f'{open_tag}{inner}{close_tag}'
+
+
 class TelegramWhisperBot:
     def __init__(self, config_file: str = "config.json"):
         self.config = self.load_config(config_file)
         self.application = None
+        # Общая HTTP-сессия: keep-alive соединения к API переиспользуются между запросами
+        self.http = self._create_http_session()
         self.temp_dir = Path(tempfile.gettempdir()) / "whisper_bot"
         self.temp_dir.mkdir(exist_ok=True)
         # Хранилище последних изображений по chat_id
@@ -81,15 +197,87 @@ class TelegramWhisperBot:
         )
         # Список доступных моделей OpenRouter
         self.available_models = []
+        # Кэш страниц клавиатуры выбора модели {(page, current_model): результат get_model_keyboard},
+        # сбрасывается при каждом обновлении списка моделей
+        self._model_keyboard_cache: dict = {}
+        # Валидаторы последнего ответа /models (ETag, Last-Modified) и сам список для условного GET
+        self._models_etag = None
+        self._models_last_modified = None
+        self._models_data = None
         # Файл для хранения выбранных моделей по chat_id
         self.selected_models_file = "selected_models.json"
         # Хранилище выбранных моделей {chat_id: model_id}
         self.selected_models = self.load_selected_models()
+        # LRU-кэш готовых summary {"<модель>|<URL видео>": summary}, переживает перезапуск
+        self.summary_cache_file = "summary_cache.json"
+        self.summary_cache = self.load_summary_cache()
+        # Сохранения кэша идут из потоков to_thread — сериализуем их, чтобы записи не перемешались
+        self._summary_cache_save_lock = threading.Lock()
         # Спам-защита для /reg: {user_id: {"count": int, "banned_until": datetime | None}}
         self._reg_spam: dict = {}
         # Активные викторины {chat_id: state_dict}. См. quiz_command для структуры состояния.
         # Состояние в памяти: при перезапуске бота активные викторины прерываются — это приемлемо.
         self.active_quizzes: dict = {}
+        # Кэш Markdown → HTML для повторяющихся текстов (справка, типовые ошибки): {text: html}
+        self._md_html_cache: dict = {}
+        # Окружение для whisper.exe: собирается один раз, а не копируется на каждый запрос
+        self._whisper_env = {**os.environ, 'PYTHONIOENCODING': 'utf-8'}
+        # Ограничение одновременных запросов к image API (см. IMAGE_API_CONCURRENCY)
+        self._image_sem = asyncio.Semaphore(self.IMAGE_API_CONCURRENCY)
+        # Модель faster-whisper (whisper_backend = "faster-whisper") загружается один раз при первой транскрипции
+        self._whisper_model = None
+        self._whisper_model_lock = threading.Lock()
+        # Размер батча BatchedInferencePipeline (0 — обычная последовательная транскрипция)
+        self._whisper_batch_size = 0
+        # VAD-фильтр перед декодированием (в батчевом режиме включён всегда)
+        self._whisper_vad = True
+
+    def _create_http_session(self) -> requests.Session:
+        """Создаёт requests.Session с пулом keep-alive соединений для внешних API."""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=64,
+            # Повторы по статусу urllib3 делает только для идемпотентных методов (GET/HEAD),
+            # POST к LLM не дублируется; после исчерпания попыток возвращается последний ответ
+            max_retries=Retry(
+                total=2,
+                backoff_factor=0.5,
+                status_forcelist=(429, 500, 502, 503, 504),
+                raise_on_status=False,
+            ),
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _prewarm_http_connections(self):
+        """Заранее открывает keep-alive соединения к хостам выбранных провайдеров API.
+
+        Первый пользовательский запрос (например, /summary) не платит за DNS + TCP + TLS:
+        соединение уже лежит в пуле self.http. Ошибки не критичны и пишутся в debug.
+        """
+        origins = set()
+        for section in self.config.values():
+            if not isinstance(section, dict) or "provider" not in section:
+                continue
+            provider_config = section.get(section["provider"])
+            if not isinstance(provider_config, dict):
+                continue
+            url = provider_config.get("url")
+            if not url and section["provider"] == "google":
+                url = "https://generativelanguage.googleapis.com/v1beta"
+            if url:
+                parsed = urlparse(url)
+                if parsed.scheme in ("http", "https") and parsed.netloc:
+                    origins.add(f"{parsed.scheme}://{parsed.netloc}/")
+        
+        for origin in origins:
+            try:
+                self.http.head(origin, timeout=5)
+                logger.debug(f"Соединение с {origin} прогрето")
+            except Exception as e:
+                logger.debug(f"Не удалось прогреть соединение с {origin}: {e}")
 
     def load_config(self, config_file: str) -> dict:
         """Загружает конфигурацию из JSON файла"""
@@ -190,6 +378,47 @@ class TelegramWhisperBot:
         except Exception as e:
             logger.error(f"Ошибка при сохранении выбранных моделей: {e}")
     
+    # Сколько summary хранить в кэше; самые давно использованные вытесняются первыми
+    SUMMARY_CACHE_MAX = 256
+
+    def load_summary_cache(self) -> OrderedDict:
+        """Загружает кэш summary из файла"""
+        try:
+            if os.path.exists(self.summary_cache_file):
+                with open(self.summary_cache_file, 'r', encoding='utf-8') as f:
+                    return OrderedDict(json.load(f))
+            return OrderedDict()
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке кэша summary: {e}")
+            return OrderedDict()
+    
+    def save_summary_cache(self, snapshot: Optional[dict] = None):
+        """Сохраняет кэш summary (или его снимок, если запись идёт из другого потока) в файл"""
+        try:
+            # Пишем во временный файл и атомарно подменяем: при сбое на диске остаётся прежний кэш
+            tmp_file = f"{self.summary_cache_file}.tmp"
+            with self._summary_cache_save_lock:
+                with open(tmp_file, 'w', encoding='utf-8') as f:
+                    json.dump(self.summary_cache if snapshot is None else snapshot, f, ensure_ascii=False)
+                os.replace(tmp_file, self.summary_cache_file)
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении кэша summary: {e}")
+    
+    def _summary_cache_get(self, key: str) -> Optional[str]:
+        """Возвращает summary из кэша и помечает его как недавно использованный"""
+        summary = self.summary_cache.get(key)
+        if summary is not None:
+            self.summary_cache.move_to_end(key)
+        return summary
+    
+    async def _summary_cache_put(self, key: str, summary: str):
+        """Кладёт summary в кэш, вытесняя самые старые записи, и сохраняет кэш на диск"""
+        self.summary_cache[key] = summary
+        self.summary_cache.move_to_end(key)
+        while len(self.summary_cache) > self.SUMMARY_CACHE_MAX:
+            self.summary_cache.popitem(last=False)
+        await asyncio.to_thread(self.save_summary_cache, dict(self.summary_cache))
+    
     def fetch_openrouter_models(self):
         """Загружает и фильтрует список моделей с OpenRouter API"""
         try:
@@ -203,20 +432,32 @@ class TelegramWhisperBot:
                 "Authorization": f"Bearer {api_key}",
                 "Content-Type": "application/json"
             }
+            # Условный запрос: если список не менялся, сервер ответит 304 без тела
+            if self._models_data is not None:
+                if self._models_etag:
+                    headers["If-None-Match"] = self._models_etag
+                if self._models_last_modified:
+                    headers["If-Modified-Since"] = self._models_last_modified
             
             logger.info("Загружаю список моделей с OpenRouter API...")
-            response = requests.get(
+            response = self.http.get(
                 "https://openrouter.ai/api/v1/models",
                 headers=headers,
                 timeout=30
             )
             
-            if response.status_code != 200:
+            if response.status_code == 304 and self._models_data is not None:
+                logger.info("Список моделей OpenRouter не изменился (304)")
+                models_data = self._models_data
+            elif response.status_code != 200:
                 logger.error(f"Ошибка при загрузке моделей: {response.status_code} - {response.text}")
                 return []
-            
-            data = response.json()
-            models_data = data.get("data", [])
+            else:
+                data = _json_loads(response.content)
+                models_data = data.get("data", [])
+                self._models_data = models_data
+                self._models_etag = response.headers.get("ETag")
+                self._models_last_modified = response.headers.get("Last-Modified")
             
             # Фильтруем модели
             # created не старше 6 месяцев (в секундах: 6 * 30 * 24 * 60 * 60)
@@ -246,7 +487,11 @@ class TelegramWhisperBot:
             # Сортируем по дате создания (новые первые)
             filtered_models.sort(key=lambda x: x["created"], reverse=True)
             
-            self.available_models = filtered_models
+            # Сбрасываем кэш клавиатур, только если отфильтрованный список действительно изменился
+            # (при 304 он может измениться лишь за счёт моделей, вышедших за окно в 6 месяцев)
+            if filtered_models != self.available_models:
+                self.available_models = filtered_models
+                self._model_keyboard_cache.clear()
             logger.info(f"Загружено {len(filtered_models)} моделей (из {len(models_data)} всего)")
             return filtered_models
             
@@ -257,7 +502,7 @@ class TelegramWhisperBot:
     async def update_models_periodically(self, context: ContextTypes.DEFAULT_TYPE):
         """Периодически обновляет список моделей (вызывается job_queue)"""
         logger.info("Периодическое обновление списка моделей...")
-        self.fetch_openrouter_models()
+        await asyncio.to_thread(self.fetch_openrouter_models)
 
     def fetch_steam_games(self) -> int:
         """Загружает полный список игр Steam через IStoreService/GetAppList и атомарно перезаписывает таблицу steam_games.
@@ -647,38 +892,18 @@ class TelegramWhisperBot:
         
         try:
             api_config = self.get_api_config("summary_api")
-            provider = self.config["summary_api"].get("provider", "google")
             
-            if provider == "google":
-                # Новый путь: напрямую передаём YouTube URL в Gemini
-                await self.update_status(processing_msg, "🤖 Gemini анализирует видео...")
-                summary = await self.create_summary_with_gemini(youtube_url, api_config)
+            # Это видео этой же моделью уже разбирали — отдаём готовый summary без запросов к API
+            summary = self._summary_cache_get(f"{api_config['model']}|{youtube_url}")
+            if summary:
+                logger.info(f"Summary взят из кэша: {youtube_url}")
             else:
-                # Старый путь через скачивание + транскрипцию + LLM (для grok/openrouter)
-                await self.update_status(processing_msg, "📥 Скачиваю аудио с YouTube...")
-                audio_file = await self.download_audio(youtube_url)
-                if not audio_file:
-                    await self.update_status(processing_msg, "❌ Ошибка при скачивании аудио. Проверьте URL видео.")
-                    return
-                
-                await self.update_status(processing_msg, "🎤 Создаю транскрипт...")
-                transcript = await self.transcribe_audio_with_progress(audio_file, processing_msg)
-                if not transcript:
-                    await self.update_status(processing_msg, "❌ Ошибка при создании транскрипта.")
+                summary, model = await self.summarize(youtube_url, processing_msg)
+                if not summary:
+                    # Причина ошибки уже показана в processing_msg
                     return
-                
-                await self.update_status(processing_msg, "🧹 Очищаю транскрипт...")
-                cleaned_transcript = self.clean_transcript(transcript)
-                
-                await self.update_status(processing_msg, "🤖 Генерирую summary...")
-                summary = await self.create_summary(cleaned_transcript)
-                
-                # Очищаем временные файлы после старого пути
-                await self.cleanup_temp_files()
-            
-            if not summary:
-                await self.update_status(processing_msg, "❌ Ошибка при создании summary.")
-                return
+                # Ключ — модель, которая реально написала summary (при откате с Gemini это запасной провайдер)
+                await self._summary_cache_put(f"{model}|{youtube_url}", summary)
             
             # Отправляем результат
             await self.update_status(processing_msg, "✅ Готово!")
@@ -693,6 +918,83 @@ class TelegramWhisperBot:
             logger.error(f"Ошибка при обработке видео: {e}")
             await self.update_status(processing_msg, f"❌ Произошла ошибка: {str(e)}")
     
+    async def summarize(self, youtube_url: str, processing_msg) -> Tuple[Optional[str], Optional[str]]:
+        """Создаёт summary YouTube-видео самым дешёвым доступным путём.
+        
+        При провайдере google ссылка уходит в Gemini напрямую (file_data) — без скачивания
+        и Whisper. Локальный путь (yt-dlp → Whisper → LLM) используется для остальных
+        провайдеров, а также как запасной, если Gemini не вернул summary и в summary_api
+        настроен ещё один провайдер.
+        
+        Returns:
+            tuple: (текст summary или None, модель, которая его создала). При None причина
+                ошибки уже показана в processing_msg
+        """
+        summary_config = self.config["summary_api"]
+        api_config = self.get_api_config("summary_api")
+        
+        if summary_config.get("provider", "google") == "google":
+            await self.update_status(processing_msg, "🤖 Gemini анализирует видео...")
+            
+            last_preview = None
+            
+            async def show_partial_summary(text: str):
+                # Уже написанная часть summary, пока Gemini продолжает генерацию (лимит сообщения — 4096)
+                nonlocal last_preview
+                preview = text if len(text) <= 3500 else text[:3500] + "…"
+                # После обрезки превью перестаёт меняться — повторный edit Telegram отклонит как "not modified"
+                if preview == last_preview:
+                    return
+                last_preview = preview
+                await self.update_status(processing_msg, f"🤖 Gemini пишет summary...\n\n{preview}")
+            
+            summary = await self.create_summary_with_gemini(youtube_url, api_config, on_progress=show_partial_summary)
+            if summary:
+                return summary, api_config["model"]
+            
+            # Запасной провайдер для локального пути — первый не-google из summary_api
+            fallback = next((name for name in summary_config if name not in ("provider", "google")), None)
+            if fallback is None:
+                await self.update_status(processing_msg, "❌ Ошибка при создании summary.")
+                return None, None
+            api_config = summary_config[fallback]
+            # Этот ролик уже разбирал запасной провайдер — не гоняем yt-dlp и Whisper повторно
+            summary = self._summary_cache_get(f"{api_config['model']}|{youtube_url}")
+            if summary:
+                logger.info(f"Gemini не вернул summary, беру из кэша результат провайдера '{fallback}'")
+                return summary, api_config["model"]
+            logger.warning(f"Gemini не вернул summary, перехожу на транскрипцию и провайдера '{fallback}'")
+        
+        summary = await self._summarize_from_transcript(youtube_url, processing_msg, api_config)
+        return summary, api_config["model"]
+    
+    async def _summarize_from_transcript(self, youtube_url: str, processing_msg, api_config: dict) -> Optional[str]:
+        """Локальный путь summary: скачивание аудио, транскрипция Whisper и запрос к LLM"""
+        await self.update_status(processing_msg, "📥 Скачиваю аудио с YouTube...")
+        audio_file = await self.download_audio(youtube_url)
+        if not audio_file:
+            await self.update_status(processing_msg, "❌ Ошибка при скачивании аудио. Проверьте URL видео.")
+            return None
+        
+        await self.update_status(processing_msg, "🎤 Создаю транскрипт...")
+        transcript = await self.transcribe_audio_with_progress(audio_file, processing_msg)
+        if not transcript:
+            await self.update_status(processing_msg, "❌ Ошибка при создании транскрипта.")
+            return None
+        
+        await self.update_status(processing_msg, "🧹 Очищаю транскрипт...")
+        cleaned_transcript = self.clean_transcript(transcript)
+        
+        await self.update_status(processing_msg, "🤖 Генерирую summary...")
+        summary = await self.create_summary(cleaned_transcript, api_config)
+        
+        # Очищаем временные файлы после локального пути
+        await self.cleanup_temp_files()
+        
+        if not summary:
+            await self.update_status(processing_msg, "❌ Ошибка при создании summary.")
+        return summary
+    
     async def update_status(self, message, status_text):
         """Обновляет статус обработки"""
         try:
@@ -776,12 +1078,10 @@ class TelegramWhisperBot:
                 )
                 if photo_sent:
                     try:
-                        response = await asyncio.to_thread(
-                            requests.get, image_url, timeout=30
+                        image_bytes, content_type = await asyncio.to_thread(
+                            self._download_image_streaming, image_url
                         )
-                        if response.status_code == 200:
-                            image_bytes = response.content
-                            content_type = response.headers.get("content-type", "image/jpeg")
+                        if image_bytes:
                             image_format = content_type.split("/")[-1].split(";")[0]
                             self.last_generated_images[chat_id] = image_bytes
                             await self._save_image_after_delivery(
@@ -800,12 +1100,10 @@ class TelegramWhisperBot:
             )
             if photo_sent:
                 try:
-                    response = await asyncio.to_thread(
-                        requests.get, image_url, timeout=30
+                    image_bytes, content_type = await asyncio.to_thread(
+                        self._download_image_streaming, image_url
                     )
-                    if response.status_code == 200:
-                        image_bytes = response.content
-                        content_type = response.headers.get("content-type", "image/jpeg")
+                    if image_bytes:
                         image_format = content_type.split("/")[-1].split(";")[0]
                         self.last_generated_images[chat_id] = image_bytes
                         await self._save_image_after_delivery(
@@ -833,7 +1131,7 @@ class TelegramWhisperBot:
             # Проверяем, есть ли URL в команде
             if context.args:
                 url = context.args[0]
-                if not self.is_image_url(url):
+                if not await asyncio.to_thread(self.is_image_url, url):
                     await update.message.reply_text("❌ Указанная ссылка не является изображением. Пожалуйста, укажите корректную ссылку на изображение.")
                     return
                 
@@ -977,11 +1275,21 @@ class TelegramWhisperBot:
     def get_model_keyboard(self, page: int, current_model: str) -> tuple:
         """Создает клавиатуру с моделями для указанной страницы
         
+        Страницы кэшируются до следующего обновления списка моделей: листание
+        не пересобирает кнопки заново.
+        
         Returns:
             tuple: (keyboard, total_pages, start_idx, end_idx)
         """
+        cache_key = (page, current_model)
+        cached = self._model_keyboard_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        # Список может подмениться в потоке fetch_openrouter_models — строим страницу по снимку
+        models = self.available_models
         models_per_page = 10  # Количество моделей на странице
-        total_models = len(self.available_models)
+        total_models = len(models)
         total_pages = (total_models + models_per_page - 1) // models_per_page
         
         # Ограничиваем страницу допустимым диапазоном
@@ -994,7 +1302,7 @@ class TelegramWhisperBot:
         
         # Добавляем кнопки моделей
         for idx in range(start_idx, end_idx):
-            model = self.available_models[idx]
+            model = models[idx]
             model_id = model["id"]
             model_name = model["name"]
             # Обрезаем название, если слишком длинное
@@ -1015,7 +1323,11 @@ class TelegramWhisperBot:
         if nav_buttons:
             keyboard.append(nav_buttons)
         
-        return keyboard, total_pages, start_idx, end_idx
+        result = (keyboard, total_pages, start_idx, end_idx)
+        # Страница по устаревшему списку не кэшируется: её sel:<idx> указывали бы на другие модели
+        if models is self.available_models:
+            self._model_keyboard_cache[cache_key] = result
+        return result
     
     async def model_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /model - показывает список доступных моделей"""
@@ -1029,7 +1341,7 @@ class TelegramWhisperBot:
         # Проверяем, есть ли загруженные модели
         if not self.available_models:
             await update.message.reply_text("⏳ Загружаю список моделей...")
-            self.fetch_openrouter_models()
+            await asyncio.to_thread(self.fetch_openrouter_models)
         
         if not self.available_models:
             await update.message.reply_text("❌ Не удалось загрузить список моделей. Попробуйте позже.")
@@ -1081,7 +1393,7 @@ class TelegramWhisperBot:
         
         # Если список моделей пустой, пробуем загрузить заново
         if not self.available_models:
-            self.fetch_openrouter_models()
+            await asyncio.to_thread(self.fetch_openrouter_models)
             if not self.available_models:
                 await query.answer("Ошибка: список моделей пуст")
                 return
@@ -1650,10 +1962,10 @@ class TelegramWhisperBot:
                 "Authorization": f"Bearer {api_config['key']}"
             }
             
-            response = requests.get(url, headers=headers, timeout=30)
+            response = await asyncio.to_thread(self.http.get, url, headers=headers, timeout=30)
             response.raise_for_status()
             
-            result = response.json()
+            result = _json_loads(response.content)
             logger.info(f"Ответ OpenRouter API (balance): {result}")
             
             # Извлекаем данные
@@ -1904,12 +2216,14 @@ class TelegramWhisperBot:
                 "response_format": {"type": "json_object"},
             }
             logger.info(f"Отправляю quiz-запрос в OpenRouter (модель: {api_config['model']})")
-            response = requests.post(api_config["url"], headers=headers, json=data, timeout=300)
+            response = await asyncio.to_thread(
+                self.http.post, api_config["url"], headers=headers, json=data, timeout=300
+            )
             if response.status_code != 200:
                 logger.error(f"Quiz OpenRouter error: {response.status_code} - {self._truncate_http_error_body(response.text)}")
                 return None
             try:
-                result = response.json()
+                result = _json_loads(response.content)
             except json.JSONDecodeError as e:
                 logger.error(f"Quiz: не удалось распарсить ответ OpenRouter как JSON: {e}")
                 return None
@@ -2620,7 +2934,7 @@ class TelegramWhisperBot:
                 )
                 return None
             try:
-                result = response.json()
+                result = _json_loads(response.content)
             except json.JSONDecodeError as e:
                 logger.error(f"Bingo: не удалось распарсить ответ OpenRouter как JSON: {e}")
                 return None
@@ -2725,14 +3039,13 @@ class TelegramWhisperBot:
 
     # ========================= конец блока бинго =========================
 
-    def _mcg_image_mime_type(self, image_data: bytes) -> str:
-        if image_data.startswith(b'\x89PNG'):
-            return "image/png"
-        if image_data.startswith(b'GIF'):
-            return "image/gif"
-        if image_data.startswith(b'RIFF') and b'WEBP' in image_data[:20]:
-            return "image/webp"
-        return "image/jpeg"
+    def _image_mime_type(self, image_data: bytes) -> str:
+        """Определяет MIME-тип изображения по сигнатуре (по умолчанию image/jpeg)."""
+        mime_type = _IMAGE_MIME_BY_SIGNATURE.get(bytes(image_data[:4]), "image/jpeg")
+        if mime_type is None:
+            # RIFF-контейнер: WEBP, только если на смещении 8 стоит метка формата
+            mime_type = "image/webp" if image_data[8:12] == b'WEBP' else "image/jpeg"
+        return mime_type
 
     async def _mcg_openrouter_vision(
         self,
@@ -2746,8 +3059,7 @@ class TelegramWhisperBot:
     ) -> Optional[str]:
         """Vision-запрос к OpenRouter. Возвращает text или None."""
         try:
-            mime_type = self._mcg_image_mime_type(image_data)
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            image_url = _image_data_url(self._image_mime_type(image_data), b64encode(image_data))
             headers = {
                 "Authorization": f"Bearer {api_config['key']}",
                 "Content-Type": "application/json",
@@ -2761,7 +3073,7 @@ class TelegramWhisperBot:
                     {"type": "text", "text": user_text},
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:{mime_type};base64,{image_base64}"},
+                        "image_url": {"url": image_url},
                     },
                 ],
             })
@@ -2777,7 +3089,7 @@ class TelegramWhisperBot:
             if response.status_code != 200:
                 logger.error(f"MCG OpenRouter error: {response.status_code} - {self._truncate_http_error_body(response.text)}")
                 return None
-            result = response.json()
+            result = _json_loads(response.content)
             logger.info(f"Ответ OpenRouter (mcg): {self._format_api_result_for_log(result)}")
             choice = result["choices"][0]
             finish_reason = choice.get("finish_reason")
@@ -2799,8 +3111,7 @@ class TelegramWhisperBot:
         from mtg.prompts import OUTPAINT_USER
 
         try:
-            mime_type = self._mcg_image_mime_type(image_data)
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+            image_url = _image_data_url(self._image_mime_type(image_data), b64encode(image_data))
             outpaint_model = api_config.get("outpaint_model", "google/gemini-3.1-flash-lite-image")
             headers = {
                 "Authorization": f"Bearer {api_config['key']}",
@@ -2814,7 +3125,7 @@ class TelegramWhisperBot:
                         {"type": "text", "text": OUTPAINT_USER},
                         {
                             "type": "image_url",
-                            "image_url": {"url": f"data:{mime_type};base64,{image_base64}"},
+                            "image_url": {"url": image_url},
                         },
                     ],
                 }],
@@ -2831,7 +3142,7 @@ class TelegramWhisperBot:
                 )
                 return None
 
-            result = response.json()
+            result = _json_loads(response.content)
             logger.info(f"Ответ OpenRouter (mcg outpaint): {self._format_api_result_for_log(result)}")
 
             has_error, error_type, _should_retry = self._check_api_response_error(result)
@@ -3613,14 +3924,13 @@ class TelegramWhisperBot:
             return 0.0
     
     def parse_whisper_timestamp(self, line: str) -> float:
-        """Извлекает время из строки Whisper (формат [02:40.000 --> 02:42.000])"""
+        """Извлекает время из строки Whisper (формат [02:40.000 --> 02:42.000] или [01:02:40.000 --> ...])"""
         try:
-            # Ищем паттерн [MM:SS.mmm --> MM:SS.mmm]
-            match = re.search(r'\[(\d{1,2}):(\d{2})\.(\d{3})\s*-->\s*(\d{1,2}):(\d{2})\.(\d{3})\]', line)
+            match = _WHISPER_TIMESTAMP_RE.match(line)
             if match:
-                start_min, start_sec, start_ms, end_min, end_sec, end_ms = match.groups()
+                end_hours, end_min, end_sec, end_ms = match.groups()
                 # Берем конечное время как прогресс
-                end_time = int(end_min) * 60 + int(end_sec) + int(end_ms) / 1000.0
+                end_time = int(end_hours or 0) * 3600 + int(end_min) * 60 + int(end_sec) + int(end_ms) / 1000.0
                 return end_time
             return 0.0
         except Exception as e:
@@ -3677,77 +3987,83 @@ class TelegramWhisperBot:
         Обрабатывает: заголовки (#), жирный (**), курсив (*/_), код (```/`),
         списки (- / * / 1.), горизонтальные линии (---).
         Экранирует HTML-сущности (<, >, &).
+        Результат для коротких текстов кэшируется (до 256 записей, вытесняется самая старая).
         """
+        cached = self._md_html_cache.get(text)
+        if cached is not None:
+            return cached
+        html_text = self._markdown_to_telegram_html_uncached(text)
+        # Длинные уникальные ответы LLM не кэшируем — они почти не повторяются
+        if len(text) <= 4000:
+            if len(self._md_html_cache) >= 256:
+                del self._md_html_cache[next(iter(self._md_html_cache))]
+            self._md_html_cache[text] = html_text
+        return html_text
+    
+    def _markdown_to_telegram_html_uncached(self, text: str) -> str:
+        """Собственно конвертация Markdown → Telegram HTML (см. markdown_to_telegram_html)."""
         import html as html_module
         
         lines = text.split('\n')
         result_lines = []
+        # Локальная ссылка на append: без поиска атрибута на каждой строке
+        append = result_lines.append
         in_code_block = False
         
         for line in lines:
             # Обработка блоков кода (```)
             if line.strip().startswith('```'):
                 if in_code_block:
-                    result_lines.append('</code></pre>')
+                    append('</code></pre>')
                     in_code_block = False
                 else:
-                    result_lines.append('<pre><code>')
+                    append('<pre><code>')
                     in_code_block = True
                 continue
             
             if in_code_block:
-                result_lines.append(html_module.escape(line))
+                append(html_module.escape(line))
                 continue
             
             # Экранируем HTML-сущности
             line = html_module.escape(line)
             
             # Горизонтальная линия
-            if re.match(r'^-{3,}$', line.strip()) or re.match(r'^\*{3,}$', line.strip()):
-                result_lines.append('—' * 20)
+            stripped = line.strip()
+            if stripped[:1] in ('-', '*') and (re.match(r'^-{3,}$', stripped) or re.match(r'^\*{3,}$', stripped)):
+                append('—' * 20)
                 continue
             
             # Заголовки: ### → <b>, ## → <b>, # → <b>  (Telegram не поддерживает <h1>)
-            header_match = re.match(r'^(#{1,6})\s+(.+)$', line)
+            header_match = re.match(r'^(#{1,6})\s+(.+)$', line) if line.startswith('#') else None
             if header_match:
                 header_text = header_match.group(2).strip()
                 # Обрабатываем инлайн-форматирование внутри заголовка
                 header_text = self._inline_markdown_to_html(header_text)
-                result_lines.append(f'\n<b>{header_text}</b>')
+                append(f'\n<b>{header_text}</b>')
                 continue
             
             # Инлайн-форматирование
             line = self._inline_markdown_to_html(line)
             
-            result_lines.append(line)
+            append(line)
         
         # Если блок кода не был закрыт
         if in_code_block:
-            result_lines.append('</code></pre>')
+            append('</code></pre>')
         
         return '\n'.join(result_lines)
     
     def _inline_markdown_to_html(self, text: str) -> str:
         """Конвертирует инлайн-Markdown в Telegram HTML.
         
-        Обрабатывает: **bold**, *italic*, __bold__, _italic_, `code`, ~~strikethrough~~
+        Обрабатывает: **bold**, *italic*, __bold__, _italic_, `code`, ~~strikethrough~~, [text](url).
+        Все шаблоны объединены в _INLINE_MD_RE — строка сканируется один раз.
         """
-        # Жирный + курсив (***text***)
-        text = re.sub(r'\*{3}(.+?)\*{3}', r'<b><i>\1</i></b>', text)
-        # Жирный (**text** или __text__)
-        text = re.sub(r'\*{2}(.+?)\*{2}', r'<b>\1</b>', text)
-        text = re.sub(r'__(.+?)__', r'<b>\1</b>', text)
-        # Курсив (*text* или _text_), но не внутри слов с подчёркиваниями
-        text = re.sub(r'(?<!\w)\*(.+?)\*(?!\w)', r'<i>\1</i>', text)
-        text = re.sub(r'(?<!\w)_(.+?)_(?!\w)', r'<i>\1</i>', text)
-        # Зачёркнутый (~~text~~)
-        text = re.sub(r'~~(.+?)~~', r'<s>\1</s>', text)
-        # Инлайн-код (`code`)
-        text = re.sub(r'`(.+?)`', r'<code>\1</code>', text)
-        # Ссылки [text](url) → просто text (Telegram HTML ссылки сложнее)
-        text = re.sub(r'\[([^\]]+)\]\([^\)]+\)', r'\1', text)
-        
-        return text
+        # Строки без маркеров разметки (большинство) не гоняем через регулярку
+        if not any(marker in text for marker in _INLINE_MD_MARKERS):
+            return text
+        return _INLINE_MD_RE.sub(_inline_md_replace, text)
     
     def escape_markdown_v2(self, text: str) -> str:
         """Экранирует специальные символы для Telegram MarkdownV2
@@ -3765,33 +4081,33 @@ class TelegramWhisperBot:
         
         return result
     
+    def _likely_valid_markdown(self, text: str) -> bool:
+        """Дешёвая локальная проверка: парны ли *, _ и ` (иначе Telegram отклонит Markdown)."""
+        return all(text.count(c) % 2 == 0 for c in '*_`')
+    
     async def send_markdown_message(self, message, text: str, reply_to_message_id: int = None):
         """Отправляет сообщение с поддержкой Markdown
         
-        Пробует отправить с Markdown, при ошибке - без форматирования.
+        Если разметка заведомо непарная — сразу отправляет без форматирования,
+        иначе пробует Markdown и при ошибке повторяет без форматирования.
         
         Args:
             message: Объект сообщения для ответа
             text: Текст сообщения
             reply_to_message_id: ID сообщения для ответа (опционально)
         """
+        reply_kwargs = {"reply_to_message_id": reply_to_message_id} if reply_to_message_id else {}
+        if self._likely_valid_markdown(text):
+            try:
+                # Пробуем отправить с Markdown (старый формат, более лояльный к ошибкам)
+                return await message.reply_text(text, parse_mode='Markdown', **reply_kwargs)
+            except Exception as e:
+                logger.warning(f"Ошибка при отправке с Markdown: {e}, отправляю без форматирования")
         try:
-            # Пробуем отправить с Markdown (старый формат, более лояльный к ошибкам)
-            if reply_to_message_id:
-                return await message.reply_text(text, parse_mode='Markdown', reply_to_message_id=reply_to_message_id)
-            else:
-                return await message.reply_text(text, parse_mode='Markdown')
+            return await message.reply_text(text, **reply_kwargs)
         except Exception as e:
-            logger.warning(f"Ошибка при отправке с Markdown: {e}, отправляю без форматирования")
-            try:
-                # Если Markdown не сработал, пробуем без форматирования
-                if reply_to_message_id:
-                    return await message.reply_text(text, reply_to_message_id=reply_to_message_id)
-                else:
-                    return await message.reply_text(text)
-            except Exception as e2:
-                logger.error(f"Ошибка при отправке сообщения: {e2}")
-                raise
+            logger.error(f"Ошибка при отправке сообщения: {e}")
+            raise
     
     async def send_ai_response(self, target, ai_text: str, header: str, continuation_header: str = "Продолжение",
                                chat_id: str = None):
@@ -3848,7 +4164,7 @@ class TelegramWhisperBot:
             
             # Дополнительная проверка через HEAD запрос
             try:
-                response = requests.head(url, timeout=10, allow_redirects=True)
+                response = self.http.head(url, timeout=10, allow_redirects=True)
                 content_type = response.headers.get('content-type', '').lower()
                 return content_type.startswith('image/')
             except:
@@ -3862,7 +4178,7 @@ class TelegramWhisperBot:
         """Скачивает изображение по URL"""
         try:
             logger.info(f"Скачиваю изображение: {url}")
-            response = requests.get(url, timeout=30, allow_redirects=True)
+            response = await asyncio.to_thread(self.http.get, url, timeout=30, allow_redirects=True)
             response.raise_for_status()
             
             # Проверяем content-type
@@ -3935,6 +4251,22 @@ class TelegramWhisperBot:
             logger.error(f"Ошибка при получении последнего изображения: {e}", exc_info=True)
             return None
     
+    async def _post_json(self, url: str, key: str, payload: dict, timeout=300) -> tuple:
+        """POST JSON-запроса к OpenAI-совместимому API (Bearer-ключ).
+
+        Returns:
+            tuple: (status_code, headers, raw_body_bytes)
+        """
+        headers = {
+            "Authorization": f"Bearer {key}",
+            "Content-Type": "application/json"
+        }
+        # Блокирующий запрос уходит в пул потоков — event loop продолжает обслуживать других пользователей
+        response = await asyncio.to_thread(
+            self.http.post, url, headers=headers, data=_json_dumps(payload), timeout=timeout
+        )
+        return response.status_code, response.headers, response.content
+
     async def describe_image_with_ai(self, image_data: bytes):
         """Отправляет изображение в AI API для описания (Grok или OpenRouter)
         
@@ -3943,17 +4275,8 @@ class TelegramWhisperBot:
             None: в случае ошибки
         """
         try:
-            # Кодируем изображение в base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Определяем MIME тип
-            mime_type = "image/jpeg"  # По умолчанию
-            if image_data.startswith(b'\x89PNG'):
-                mime_type = "image/png"
-            elif image_data.startswith(b'GIF'):
-                mime_type = "image/gif"
-            elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:20]:
-                mime_type = "image/webp"
+            # Кодируем изображение в base64 data URL (MIME тип по сигнатуре)
+            image_url = _image_data_url(self._image_mime_type(image_data), b64encode(image_data))
             
             # Получаем конфигурацию провайдера
             api_config = self.get_api_config("describe_api")
@@ -3963,22 +4286,17 @@ class TelegramWhisperBot:
             logger.info(f"API конфигурация: {api_config}")
             
             if provider == "grok":
-                return await self._describe_with_grok(image_data, image_base64, mime_type, api_config)
+                return await self._describe_with_grok(image_url, api_config)
             else:
-                return await self._describe_with_openrouter(image_data, image_base64, mime_type, api_config)
+                return await self._describe_with_openrouter(image_url, api_config)
                 
         except Exception as e:
             logger.error(f"Ошибка при описании изображения: {e}")
             return None
     
-    async def _describe_with_grok(self, image_data: bytes, image_base64: str, mime_type: str, api_config: dict) -> Optional[str]:
+    async def _describe_with_grok(self, image_url: str, api_config: dict) -> Optional[str]:
         """Описание изображения через Grok API"""
         try:
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "model": api_config["model"],
                 "messages": [
@@ -3992,7 +4310,7 @@ class TelegramWhisperBot:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -4002,50 +4320,44 @@ class TelegramWhisperBot:
             }
             
             logger.info("Отправляю изображение в Grok API")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
-            
-            if response.status_code == 200:
-                # Логируем сырой ответ для отладки
-                raw_response = response.text
-                logger.info(
-                    f"Сырой ответ Grok API (длина: {len(raw_response)}): {self._single_line_log_preview(raw_response, 500)}"
-                )
+            status, _, raw = await self._post_json(api_config["url"], api_config["key"], data)
+            
+            if status == 200:
+                # Сырой ответ декодируем только для отладочного лога
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Сырой ответ Grok API (длина: %d): %s",
+                        len(raw), self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 500)
+                    )
 
                 try:
-                    result = response.json()
-                    logger.info(f"Ответ Grok API: {self._format_api_result_for_log(result)}")
+                    result = _json_loads(raw)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Ответ Grok API: %s", self._format_api_result_for_log(result))
                     description = result['choices'][0]['message']['content']
                     logger.info("Описание изображения успешно получено через Grok")
                     return description
                 except json.JSONDecodeError as e:
                     logger.error(f"Ошибка парсинга JSON от Grok API: {e}")
-                    logger.error(f"Полный сырой ответ: {self._single_line_log_preview(raw_response, 2000)}")
+                    logger.error(
+                        f"Полный сырой ответ: {self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 2000)}"
+                    )
                     return None
                 except (KeyError, IndexError) as e:
                     logger.error(f"Неожиданная структура ответа от Grok API: {e}")
                     logger.error(f"Структура ответа: {self._format_api_result_for_log(result)}")
                     return None
             else:
-                logger.error(f"Ошибка Grok API: {response.status_code} - {response.text}")
+                logger.error(f"Ошибка Grok API: {status} - {raw.decode('utf-8', errors='replace')}")
                 return None
                 
         except Exception as e:
             logger.error(f"Ошибка при описании изображения через Grok: {e}")
             return None
     
-    async def _describe_with_openrouter(self, image_data: bytes, image_base64: str, mime_type: str, api_config: dict) -> Optional[str]:
+    async def _describe_with_openrouter(self, image_url: str, api_config: dict) -> Optional[str]:
         """Описание изображения через OpenRouter API"""
         try:
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "model": api_config["model"],
                 "messages": [
@@ -4059,7 +4371,7 @@ class TelegramWhisperBot:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -4069,53 +4381,49 @@ class TelegramWhisperBot:
             }
             
             logger.info("Отправляю изображение в OpenRouter API")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
+            status, resp_headers, raw = await self._post_json(api_config["url"], api_config["key"], data)
             
-            if response.status_code == 200:
+            if status == 200:
                 # Проверяем Content-Type
-                content_type = response.headers.get('content-type', '')
+                content_type = resp_headers.get('content-type', '')
                 logger.info(f"Content-Type ответа OpenRouter API (describe): {content_type}")
                 
-                # Логируем сырой ответ для отладки
-                raw_response = response.text
-                
                 # Проверяем на пустой ответ
-                if not raw_response or len(raw_response.strip()) == 0:
+                if not raw.strip():
                     logger.error("Получен пустой ответ от OpenRouter API (describe)")
                     return None
                 
-                logger.info(
-                    f"Сырой ответ OpenRouter API (describe, длина: {len(raw_response)}): "
-                    f"{self._single_line_log_preview(raw_response, 500)}"
-                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Сырой ответ OpenRouter API (describe, длина: %d): %s",
+                        len(raw), self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 500)
+                    )
 
                 # Проверяем, что это действительно JSON
                 if 'application/json' not in content_type.lower():
                     logger.error(f"Получен не-JSON ответ от OpenRouter API. Content-Type: {content_type}")
-                    logger.error(f"Полный ответ: {raw_response}")
+                    logger.error(f"Полный ответ: {raw.decode('utf-8', errors='replace')}")
                     return None
                 
                 try:
-                    result = response.json()
-                    logger.info(f"Ответ OpenRouter API (describe): {self._format_api_result_for_log(result)}")
+                    result = _json_loads(raw)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Ответ OpenRouter API (describe): %s", self._format_api_result_for_log(result))
                     description = result['choices'][0]['message']['content']
                     logger.info("Описание изображения успешно получено через OpenRouter")
                     return description
                 except json.JSONDecodeError as e:
                     logger.error(f"Ошибка парсинга JSON от OpenRouter API (describe): {e}")
-                    logger.error(f"Полный сырой ответ: {self._single_line_log_preview(raw_response, 2000)}")
+                    logger.error(
+                        f"Полный сырой ответ: {self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 2000)}"
+                    )
                     return None
                 except (KeyError, IndexError) as e:
                     logger.error(f"Неожиданная структура ответа от OpenRouter API (describe): {e}")
                     logger.error(f"Структура ответа: {self._format_api_result_for_log(result)}")
                     return None
             else:
-                logger.error(f"Ошибка OpenRouter API: {response.status_code} - {response.text}")
+                logger.error(f"Ошибка OpenRouter API: {status} - {raw.decode('utf-8', errors='replace')}")
                 return None
                 
         except Exception as e:
@@ -4133,11 +4441,6 @@ class TelegramWhisperBot:
             str: response_text или None в случае ошибки
         """
         try:
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "model": api_config["model"],
                 "messages": [
@@ -4149,49 +4452,46 @@ class TelegramWhisperBot:
             }
             
             logger.info(f"Отправляю текстовый запрос в OpenRouter API (модель: {api_config['model']})")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
+            status, resp_headers, raw = await self._post_json(api_config["url"], api_config["key"], data)
             
-            if response.status_code == 200:
-                content_type = response.headers.get('content-type', '')
+            if status == 200:
+                content_type = resp_headers.get('content-type', '')
                 logger.info(f"Content-Type ответа OpenRouter API (ask): {content_type}")
                 
-                raw_response = response.text
-                
-                if not raw_response or len(raw_response.strip()) == 0:
+                if not raw.strip():
                     logger.error("Получен пустой ответ от OpenRouter API (ask)")
                     return None
                 
-                logger.info(
-                    f"Сырой ответ OpenRouter API (ask, длина: {len(raw_response)}): "
-                    f"{self._single_line_log_preview(raw_response, 500)}"
-                )
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug(
+                        "Сырой ответ OpenRouter API (ask, длина: %d): %s",
+                        len(raw), self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 500)
+                    )
 
                 if 'application/json' not in content_type.lower():
                     logger.error(f"Получен не-JSON ответ от OpenRouter API. Content-Type: {content_type}")
-                    logger.error(f"Полный ответ: {raw_response}")
+                    logger.error(f"Полный ответ: {raw.decode('utf-8', errors='replace')}")
                     return None
                 
                 try:
-                    result = response.json()
-                    logger.info(f"Ответ OpenRouter API (ask): {self._format_api_result_for_log(result)}")
+                    result = _json_loads(raw)
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("Ответ OpenRouter API (ask): %s", self._format_api_result_for_log(result))
                     response_text = result['choices'][0]['message']['content']
                     logger.info("Текстовый ответ успешно получен через OpenRouter")
                     return response_text
                 except json.JSONDecodeError as e:
                     logger.error(f"Ошибка парсинга JSON от OpenRouter API (ask): {e}")
-                    logger.error(f"Полный сырой ответ: {self._single_line_log_preview(raw_response, 2000)}")
+                    logger.error(
+                        f"Полный сырой ответ: {self._single_line_log_preview(raw.decode('utf-8', errors='replace'), 2000)}"
+                    )
                     return None
                 except (KeyError, IndexError) as e:
                     logger.error(f"Неожиданная структура ответа от OpenRouter API (ask): {e}")
                     logger.error(f"Структура ответа: {self._format_api_result_for_log(result)}")
                     return None
             else:
-                logger.error(f"Ошибка OpenRouter API: {response.status_code} - {response.text}")
+                logger.error(f"Ошибка OpenRouter API: {status} - {raw.decode('utf-8', errors='replace')}")
                 return None
                 
         except Exception as e:
@@ -4224,11 +4524,11 @@ class TelegramWhisperBot:
                     data = self._decode_openrouter_image_url(content)
                     if data:
                         return data
-                if content.startswith('http://') or content.startswith('https://'):
+                if content.startswith(('http://', 'https://')):
                     return self._fetch_image_bytes_from_url(content)
-                url_match = re.search(r'(https?://[^\s]+)', content)
+                url_match = _URL_RE.search(content)
                 if url_match:
-                    return self._fetch_image_bytes_from_url(url_match.group(1))
+                    return self._fetch_image_bytes_from_url(url_match.group(0))
 
             data_result = result.get('data')
             if isinstance(data_result, list) and data_result:
@@ -4243,25 +4543,57 @@ class TelegramWhisperBot:
             logger.warning(f"Не удалось извлечь изображение из ответа OpenRouter: {e}")
             return None
 
-    def _decode_openrouter_image_url(self, image_url: str) -> Optional[bytes]:
-        if not image_url.startswith('data:image/'):
+    def _split_data_image_url(self, url: str) -> Optional[tuple]:
+        """Разбирает data:image/<format>;base64,<data>.
+
+        Регулярка сопоставляет только заголовок, base64-данные берутся срезом
+        от конца совпадения — без захвата мегабайтной группы.
+
+        Returns:
+            tuple: (image_format, base64_data) или None, если это не base64 data URL
+        """
+        match = _DATA_URL_HEAD_RE.match(url)
+        if not match or match.end() == len(url):
             return None
-        match = re.match(r'data:image/(\w+);base64,(.+)', image_url)
-        if not match:
+        return match.group(1), url[match.end():]
+
+    def _decode_openrouter_image_url(self, image_url: str) -> Optional[bytes]:
+        parsed = self._split_data_image_url(image_url)
+        if not parsed:
             return None
         try:
-            return base64.b64decode(match.group(2))
+            return b64decode(parsed[1], validate=False)
         except Exception as e:
             logger.warning(f"Ошибка декодирования base64 изображения: {e}")
             return None
 
+    def _download_image_streaming(self, url: str, timeout: int = 30, max_bytes: int = 50 * 1024 * 1024) -> tuple:
+        """Скачивает изображение по URL кусками по 64 КиБ через общую HTTP-сессию.
+
+        Загрузка прерывается, как только тело превышает max_bytes, — аномально
+        большой ответ не накапливается в памяти целиком.
+
+        Returns:
+            tuple: (image_bytes, content_type) или (None, None), если загрузить не удалось
+        """
+        with self.http.get(url, stream=True, timeout=timeout) as response:
+            if response.status_code != 200:
+                logger.warning(f"Не удалось загрузить изображение по URL: HTTP {response.status_code}")
+                return None, None
+            chunks = []
+            size = 0
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    logger.warning(f"Изображение по URL больше {max_bytes} байт, загрузка прервана")
+                    return None, None
+                chunks.append(chunk)
+            return b''.join(chunks), response.headers.get("content-type", "image/jpeg")
+
     def _fetch_image_bytes_from_url(self, url: str) -> Optional[bytes]:
         try:
-            response = requests.get(url, timeout=60)
-            if response.status_code == 200 and response.content:
-                return response.content
-            logger.warning(f"Не удалось загрузить изображение по URL: HTTP {response.status_code}")
-            return None
+            image_bytes, _ = self._download_image_streaming(url, timeout=60)
+            return image_bytes or None
         except Exception as e:
             logger.warning(f"Ошибка загрузки изображения по URL: {e}")
             return None
@@ -4273,9 +4605,9 @@ class TelegramWhisperBot:
                 return False
             content = message.get('content')
             if isinstance(content, str) and content and not content.startswith('data:image/'):
-                if content.startswith('http://') or content.startswith('https://'):
+                if content.startswith(('http://', 'https://')):
                     return False
-                if re.search(r'https?://[^\s]+', content):
+                if _URL_RE.search(content):
                     return False
                 return True
             return False
@@ -4323,7 +4655,126 @@ class TelegramWhisperBot:
             logger.warning(f"Ошибка при проверке native_finish_reason: {e}")
             return False, None, False
     
-    async def generate_image_with_ai(self, prompt: str, retry_count: int = 0, api_name: str = "imagegen_api"):
+    # Таймауты (connect, read) запроса к image API. Повторяется только таймаут соединения:
+    # после отправки тела генерация может завершиться на сервере и будет оплачена
+    IMAGE_API_ATTEMPT_TIMEOUT = (15, 300)
+    # Сколько запросов generate/modify/merge выполняется одновременно. Каждый держит
+    # исходные байты, base64 и тело JSON (~20 МБ), остальные ждут своей очереди.
+    IMAGE_API_CONCURRENCY = 8
+
+    async def _image_api_retry_backoff(self, retry_count: int) -> None:
+        """Пауза перед повтором запроса к image API: экспонента с джиттером, не дольше 10 секунд."""
+        await asyncio.sleep(min(2 ** retry_count + random.random(), 10))
+
+    def _decode_data_image_result(self, data_url: str) -> Optional[dict]:
+        """Декодирует data:image/...;base64,... в {'data': bytes, 'format': str} или None."""
+        parsed = self._split_data_image_url(data_url)
+        if not parsed:
+            return None
+        image_format, base64_data = parsed
+        # validate=False (по умолчанию): base64 сгенерирован самим API, посимвольную
+        # проверку алфавита не делаем — pybase64 сразу идёт по быстрому пути
+        image_bytes = b64decode(base64_data, validate=False)
+        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
+        return {
+            'data': image_bytes,
+            'format': image_format
+        }
+
+    def _extract_image_from_response(self, result: dict, action: str) -> Optional[dict]:
+        """Достаёт изображение из ответа OpenAI-совместимого API генерации изображений.
+
+        Общий разбор для generate/modify/mergeimage. Поддерживаются форматы
+        choices[0].message.images[0].image_url.url, message.content (data URL,
+        URL или текст со ссылкой) и data[0].url.
+
+        Args:
+            result: Распарсенный JSON ответа
+            action: Глагол для логов ("сгенерировано", "изменено", "обработано")
+
+        Returns:
+            - dict: {'data': bytes, 'format': str} если API вернул base64 данные
+            - dict: {'url': str} если API вернул URL
+            - dict: {'description': str} если API ответил текстом
+            - None: если формат ответа не распознан
+        """
+        if 'choices' not in result or len(result['choices']) == 0:
+            return None
+        
+        choice = result['choices'][0]
+        
+        # Проверяем формат с images в message
+        if 'message' in choice:
+            message = choice['message']
+            
+            # Формат: choices[0].message.images[0].image_url.url
+            if 'images' in message and isinstance(message['images'], list) and len(message['images']) > 0:
+                image_obj = message['images'][0]
+                if 'image_url' in image_obj and 'url' in image_obj['image_url']:
+                    image_url = image_obj['image_url']['url']
+                    
+                    # Проверяем, это base64 data URL или обычный URL
+                    if image_url.startswith('data:image/'):
+                        logger.info("Изображение получено в формате base64, декодирую...")
+                        decoded = self._decode_data_image_result(image_url)
+                        if decoded:
+                            return decoded
+                    else:
+                        # Обычный HTTP URL
+                        logger.info(f"Изображение успешно {action} через OpenRouter (URL)")
+                        return {'url': image_url}
+            
+            # Проверяем message.content
+            if 'content' in message:
+                content = message['content']
+                
+                # Если content - это data URL с base64
+                if isinstance(content, str) and content.startswith('data:image/'):
+                    logger.info("Изображение получено в message.content в формате base64, декодирую...")
+                    decoded = self._decode_data_image_result(content)
+                    if decoded:
+                        return decoded
+                
+                # Если content - это обычный HTTP URL
+                if isinstance(content, str) and content.startswith(('http://', 'https://')):
+                    logger.info(f"Изображение успешно {action} через OpenRouter (URL в content)")
+                    return {'url': content}
+                
+                # Если content - это текст с встроенным URL
+                url_match = _URL_RE.search(content)
+                if url_match:
+                    image_url = url_match.group(0)
+                    logger.info(f"Изображение успешно {action} через OpenRouter (URL извлечен из текста)")
+                    return {'url': image_url}
+                
+                # Если content — это просто текст (не URL), модель ответила текстом, а не изображением
+                if isinstance(content, str) and len(content) > 0:
+                    logger.info("Получен текстовый ответ от API вместо изображения")
+                    return {'description': content}
+        
+        # Проверяем data URL для base64
+        if 'data' in result:
+            data_result = result['data']
+            if isinstance(data_result, list) and len(data_result) > 0:
+                if 'url' in data_result[0]:
+                    url = data_result[0]['url']
+                    if url.startswith('data:image/'):
+                        logger.info("Изображение получено в data[].url в формате base64, декодирую...")
+                        decoded = self._decode_data_image_result(url)
+                        if decoded:
+                            return decoded
+                    else:
+                        logger.info(f"Изображение успешно {action} через OpenRouter (URL в data)")
+                        return {'url': url}
+        
+        return None
+
+    async def generate_image_with_ai(self, prompt: str, api_name: str = "imagegen_api"):
+        """Генерирует изображение, ограничивая число одновременных запросов к image API."""
+        async with self._image_sem:
+            return await self._generate_image_with_ai(prompt, api_name=api_name)
+    
+    async def _generate_image_with_ai(self, prompt: str, retry_count: int = 0, api_name: str = "imagegen_api"):
         """Генерирует изображение через настроенный API
         
         Args:
@@ -4342,11 +4793,6 @@ class TelegramWhisperBot:
         try:
             api_config = self.get_api_config(api_name)
             
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
-            
             data = {
                 "model": api_config["model"],
                 "messages": [
@@ -4360,17 +4806,22 @@ class TelegramWhisperBot:
             
             attempt_msg = f" (попытка {retry_count + 1}/{max_retries + 1})" if retry_count > 0 else ""
             logger.info(f"Отправляю запрос на генерацию изображения в API с моделью {api_config['model']}{attempt_msg}")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Получен ответ от API, обрабатываю...")
-                logger.info(f"Ответ API: {self._format_api_result_for_log(result)}")
+            try:
+                status, _, raw = await self._post_json(
+                    api_config["url"], api_config["key"], data, timeout=self.IMAGE_API_ATTEMPT_TIMEOUT
+                )
+            except requests.ConnectTimeout:
+                if retry_count >= max_retries:
+                    raise
+                logger.warning(f"Таймаут соединения с API, повторяю запрос (попытка {retry_count + 2}/{max_retries + 1})...")
+                await self._image_api_retry_backoff(retry_count)
+                return await self._generate_image_with_ai(prompt, retry_count + 1, api_name)
+            
+            if status == 200:
+                result = _json_loads(raw)
+                logger.info("Получен ответ от API, обрабатываю...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Ответ API: %s", self._format_api_result_for_log(result))
                 
                 # Проверяем наличие ошибок в ответе
                 has_error, error_type, should_retry = self._check_api_response_error(result)
@@ -4378,9 +4829,8 @@ class TelegramWhisperBot:
                 if has_error:
                     if should_retry and retry_count < max_retries:
                         logger.warning(f"Получен {error_type}, повторяю запрос (попытка {retry_count + 2}/{max_retries + 1})...")
-                        import asyncio
-                        await asyncio.sleep(1)  # Небольшая задержка перед повтором
-                        return await self.generate_image_with_ai(prompt, retry_count + 1, api_name)
+                        await self._image_api_retry_backoff(retry_count)
+                        return await self._generate_image_with_ai(prompt, retry_count + 1, api_name)
                     else:
                         if should_retry:
                             error_msg = f"Не удалось сгенерировать изображение после {max_retries + 1} попыток (native_finish_reason: {error_type})"
@@ -4389,101 +4839,16 @@ class TelegramWhisperBot:
                         logger.error(error_msg)
                         return {'error': error_msg}
                 
-                # Проверяем различные форматы ответа
-                if 'choices' in result and len(result['choices']) > 0:
-                    choice = result['choices'][0]
-                    
-                    # Проверяем формат с images в message
-                    if 'message' in choice:
-                        message = choice['message']
-                        
-                        # Формат: choices[0].message.images[0].image_url.url
-                        if 'images' in message and isinstance(message['images'], list) and len(message['images']) > 0:
-                            image_obj = message['images'][0]
-                            if 'image_url' in image_obj and 'url' in image_obj['image_url']:
-                                image_url = image_obj['image_url']['url']
-                                
-                                # Проверяем, это base64 data URL или обычный URL
-                                if image_url.startswith('data:image/'):
-                                    logger.info("Изображение получено в формате base64, декодирую...")
-                                    # Формат: data:image/png;base64,iVBORw0KG...
-                                    match = re.match(r'data:image/(\w+);base64,(.+)', image_url)
-                                    if match:
-                                        image_format = match.group(1)
-                                        base64_data = match.group(2)
-                                        image_bytes = base64.b64decode(base64_data)
-                                        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                        return {
-                                            'data': image_bytes,
-                                            'format': image_format
-                                        }
-                                else:
-                                    # Обычный HTTP URL
-                                    logger.info("Изображение успешно сгенерировано через OpenRouter (URL)")
-                                    return {'url': image_url}
-                        
-                        # Проверяем message.content
-                        if 'content' in message:
-                            content = message['content']
-                            
-                            # Если content - это data URL с base64
-                            if isinstance(content, str) and content.startswith('data:image/'):
-                                logger.info("Изображение получено в message.content в формате base64, декодирую...")
-                                match = re.match(r'data:image/(\w+);base64,(.+)', content)
-                                if match:
-                                    image_format = match.group(1)
-                                    base64_data = match.group(2)
-                                    image_bytes = base64.b64decode(base64_data)
-                                    logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                    return {
-                                        'data': image_bytes,
-                                        'format': image_format
-                                    }
-                            
-                            # Если content - это обычный HTTP URL
-                            if isinstance(content, str) and (content.startswith('http://') or content.startswith('https://')):
-                                logger.info("Изображение успешно сгенерировано через OpenRouter (URL в content)")
-                                return {'url': content}
-                            
-                            # Если content - это текст с встроенным URL
-                            url_match = re.search(r'(https?://[^\s]+)', content)
-                            if url_match:
-                                image_url = url_match.group(1)
-                                logger.info("Изображение успешно сгенерировано через OpenRouter (URL извлечен из текста)")
-                                return {'url': image_url}
-                            
-                            # Если content — это просто текст (не URL), модель ответила текстом, а не изображением
-                            if isinstance(content, str) and len(content) > 0:
-                                logger.info("Получен текстовый ответ от API вместо изображения")
-                                return {'description': content}
-                    
-                    # Проверяем data URL для base64
-                    if 'data' in result:
-                        data_result = result['data']
-                        if isinstance(data_result, list) and len(data_result) > 0:
-                            if 'url' in data_result[0]:
-                                url = data_result[0]['url']
-                                if url.startswith('data:image/'):
-                                    logger.info("Изображение получено в data[].url в формате base64, декодирую...")
-                                    match = re.match(r'data:image/(\w+);base64,(.+)', url)
-                                    if match:
-                                        image_format = match.group(1)
-                                        base64_data = match.group(2)
-                                        image_bytes = base64.b64decode(base64_data)
-                                        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                        return {
-                                            'data': image_bytes,
-                                            'format': image_format
-                                        }
-                                else:
-                                    logger.info("Изображение успешно сгенерировано через OpenRouter (URL в data)")
-                                    return {'url': url}
+                image_result = self._extract_image_from_response(result, "сгенерировано")
+                if image_result is not None:
+                    return image_result
             
                 logger.error(f"Неожиданный формат ответа от OpenRouter API: {self._format_api_result_for_log(result)}")
                 return None
             else:
                 logger.error(
-                    f"Ошибка OpenRouter API: {response.status_code} - {self._truncate_http_error_body(response.text)}"
+                    f"Ошибка OpenRouter API: {status} - "
+                    f"{self._truncate_http_error_body(raw.decode('utf-8', errors='replace'))}"
                 )
                 return None
                 
@@ -4491,7 +4856,12 @@ class TelegramWhisperBot:
             logger.error(f"Ошибка при генерации изображения через OpenRouter: {e}")
             return None
     
-    async def modify_image_with_ai(self, image_data: bytes, prompt: str, retry_count: int = 0, api_name: str = "imagechange_api"):
+    async def modify_image_with_ai(self, image_data: bytes, prompt: str, api_name: str = "imagechange_api"):
+        """Изменяет изображение, ограничивая число одновременных запросов к image API."""
+        async with self._image_sem:
+            return await self._modify_image_with_ai(image_data, prompt, api_name=api_name)
+    
+    async def _modify_image_with_ai(self, image_data: bytes, prompt: str, retry_count: int = 0, api_name: str = "imagechange_api"):
         """Изменяет изображение через настроенный API
         
         Args:
@@ -4511,22 +4881,8 @@ class TelegramWhisperBot:
         try:
             api_config = self.get_api_config(api_name)
             
-            # Кодируем исходное изображение в base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
-            
-            # Определяем MIME тип
-            mime_type = "image/jpeg"  # По умолчанию
-            if image_data.startswith(b'\x89PNG'):
-                mime_type = "image/png"
-            elif image_data.startswith(b'GIF'):
-                mime_type = "image/gif"
-            elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:20]:
-                mime_type = "image/webp"
-            
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
+            # Кодируем исходное изображение в base64 data URL (MIME тип по сигнатуре)
+            image_url = _image_data_url(self._image_mime_type(image_data), b64encode(image_data))
             
             data = {
                 "model": api_config["model"],
@@ -4541,7 +4897,7 @@ class TelegramWhisperBot:
                             {
                                 "type": "image_url",
                                 "image_url": {
-                                    "url": f"data:{mime_type};base64,{image_base64}"
+                                    "url": image_url
                                 }
                             }
                         ]
@@ -4552,17 +4908,22 @@ class TelegramWhisperBot:
             
             attempt_msg = f" (попытка {retry_count + 1}/{max_retries + 1})" if retry_count > 0 else ""
             logger.info(f"Отправляю запрос на изменение изображения в API с моделью {api_config['model']}{attempt_msg}")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
-            
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Получен ответ от API, обрабатываю...")
-                logger.info(f"Ответ API: {self._format_api_result_for_log(result)}")
+            try:
+                status, _, raw = await self._post_json(
+                    api_config["url"], api_config["key"], data, timeout=self.IMAGE_API_ATTEMPT_TIMEOUT
+                )
+            except requests.ConnectTimeout:
+                if retry_count >= max_retries:
+                    raise
+                logger.warning(f"Таймаут соединения с API, повторяю запрос (попытка {retry_count + 2}/{max_retries + 1})...")
+                await self._image_api_retry_backoff(retry_count)
+                return await self._modify_image_with_ai(image_data, prompt, retry_count + 1, api_name)
+            
+            if status == 200:
+                result = _json_loads(raw)
+                logger.info("Получен ответ от API, обрабатываю...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Ответ API: %s", self._format_api_result_for_log(result))
                 
                 # Проверяем наличие ошибок в ответе
                 has_error, error_type, should_retry = self._check_api_response_error(result)
@@ -4570,9 +4931,8 @@ class TelegramWhisperBot:
                 if has_error:
                     if should_retry and retry_count < max_retries:
                         logger.warning(f"Получен {error_type}, повторяю запрос (попытка {retry_count + 2}/{max_retries + 1})...")
-                        import asyncio
-                        await asyncio.sleep(1)  # Небольшая задержка перед повтором
-                        return await self.modify_image_with_ai(image_data, prompt, retry_count + 1, api_name)
+                        await self._image_api_retry_backoff(retry_count)
+                        return await self._modify_image_with_ai(image_data, prompt, retry_count + 1, api_name)
                     else:
                         if should_retry:
                             error_msg = f"Не удалось изменить изображение после {max_retries + 1} попыток (native_finish_reason: {error_type})"
@@ -4581,101 +4941,16 @@ class TelegramWhisperBot:
                         logger.error(error_msg)
                         return {'error': error_msg}
                 
-                # Проверяем различные форматы ответа
-                if 'choices' in result and len(result['choices']) > 0:
-                    choice = result['choices'][0]
-                    
-                    # Проверяем формат с images в message
-                    if 'message' in choice:
-                        message = choice['message']
-                        
-                        # Формат: choices[0].message.images[0].image_url.url
-                        if 'images' in message and isinstance(message['images'], list) and len(message['images']) > 0:
-                            image_obj = message['images'][0]
-                            if 'image_url' in image_obj and 'url' in image_obj['image_url']:
-                                image_url = image_obj['image_url']['url']
-                                
-                                # Проверяем, это base64 data URL или обычный URL
-                                if image_url.startswith('data:image/'):
-                                    logger.info("Изображение получено в формате base64, декодирую...")
-                                    # Формат: data:image/png;base64,iVBORw0KG...
-                                    match = re.match(r'data:image/(\w+);base64,(.+)', image_url)
-                                    if match:
-                                        image_format = match.group(1)
-                                        base64_data = match.group(2)
-                                        image_bytes = base64.b64decode(base64_data)
-                                        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                        return {
-                                            'data': image_bytes,
-                                            'format': image_format
-                                        }
-                                else:
-                                    # Обычный HTTP URL
-                                    logger.info("Изображение успешно изменено через OpenRouter (URL)")
-                                    return {'url': image_url}
-                        
-                        # Проверяем message.content
-                        if 'content' in message:
-                            content = message['content']
-                            
-                            # Если content - это data URL с base64
-                            if isinstance(content, str) and content.startswith('data:image/'):
-                                logger.info("Изображение получено в message.content в формате base64, декодирую...")
-                                match = re.match(r'data:image/(\w+);base64,(.+)', content)
-                                if match:
-                                    image_format = match.group(1)
-                                    base64_data = match.group(2)
-                                    image_bytes = base64.b64decode(base64_data)
-                                    logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                    return {
-                                        'data': image_bytes,
-                                        'format': image_format
-                                    }
-                            
-                            # Если content - это обычный HTTP URL
-                            if isinstance(content, str) and (content.startswith('http://') or content.startswith('https://')):
-                                logger.info("Изображение успешно изменено через OpenRouter (URL в content)")
-                                return {'url': content}
-                            
-                            # Если content - это текст с встроенным URL
-                            url_match = re.search(r'(https?://[^\s]+)', content)
-                            if url_match:
-                                image_url = url_match.group(1)
-                                logger.info("Изображение успешно изменено через OpenRouter (URL извлечен из текста)")
-                                return {'url': image_url}
-                            
-                            # Если content — это просто текст (не URL), модель ответила текстом, а не изображением
-                            if isinstance(content, str) and len(content) > 0:
-                                logger.info("Получен текстовый ответ от API вместо изображения")
-                                return {'description': content}
-                    
-                    # Проверяем data URL для base64
-                    if 'data' in result:
-                        data_result = result['data']
-                        if isinstance(data_result, list) and len(data_result) > 0:
-                            if 'url' in data_result[0]:
-                                url = data_result[0]['url']
-                                if url.startswith('data:image/'):
-                                    logger.info("Изображение получено в data[].url в формате base64, декодирую...")
-                                    match = re.match(r'data:image/(\w+);base64,(.+)', url)
-                                    if match:
-                                        image_format = match.group(1)
-                                        base64_data = match.group(2)
-                                        image_bytes = base64.b64decode(base64_data)
-                                        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                        return {
-                                            'data': image_bytes,
-                                            'format': image_format
-                                        }
-                                else:
-                                    logger.info("Изображение успешно изменено через OpenRouter (URL в data)")
-                                    return {'url': url}
+                image_result = self._extract_image_from_response(result, "изменено")
+                if image_result is not None:
+                    return image_result
             
                 logger.error(f"Неожиданный формат ответа от OpenRouter API: {self._format_api_result_for_log(result)}")
                 return None
             else:
                 logger.error(
-                    f"Ошибка OpenRouter API: {response.status_code} - {self._truncate_http_error_body(response.text)}"
+                    f"Ошибка OpenRouter API: {status} - "
+                    f"{self._truncate_http_error_body(raw.decode('utf-8', errors='replace'))}"
                 )
                 return None
                 
@@ -4684,6 +4959,11 @@ class TelegramWhisperBot:
             return None
     
     async def process_multiple_images_with_ai(self, images_list: list, prompt: str, api_name: str = "mergeimage_api"):
+        """Обрабатывает несколько изображений, ограничивая число одновременных запросов к image API."""
+        async with self._image_sem:
+            return await self._process_multiple_images_with_ai(images_list, prompt, api_name=api_name)
+    
+    async def _process_multiple_images_with_ai(self, images_list: list, prompt: str, api_name: str = "mergeimage_api"):
         """Обрабатывает несколько изображений через настроенный API
         
         Args:
@@ -4701,11 +4981,6 @@ class TelegramWhisperBot:
         try:
             api_config = self.get_api_config(api_name)
             
-            headers = {
-                "Authorization": f"Bearer {api_config['key']}",
-                "Content-Type": "application/json"
-            }
-            
             # Подготавливаем content с текстом и всеми изображениями
             content_parts = [
                 {
@@ -4714,27 +4989,40 @@ class TelegramWhisperBot:
                 }
             ]
             
-            # Добавляем все изображения
-            for idx, image_data in enumerate(images_list):
-                # Кодируем изображение в base64
-                image_base64 = base64.b64encode(image_data).decode('utf-8')
-                
+            # Добавляем все изображения. Одинаковые (например, пересланные дважды)
+            # кодируем в base64 один раз и переиспользуем готовую часть запроса.
+            # blake2b отпускает GIL на больших буферах — хэшируем в пуле потоков, не на event loop
+            digests = await asyncio.gather(
+                *(asyncio.to_thread(_image_digest, image_data) for image_data in images_list)
+            )
+            unique_images = dict(zip(digests, images_list))
+            
+            # Кодируем уникальные изображения параллельно в пуле потоков:
+            # pybase64 отпускает GIL на больших буферах, event loop не блокируется
+            encoded_images = await asyncio.gather(
+                *(asyncio.to_thread(b64encode, image_data) for image_data in unique_images.values())
+            )
+            
+            image_parts_by_digest = {}
+            for (digest, image_data), image_base64 in zip(unique_images.items(), encoded_images):
                 # Определяем MIME тип
-                mime_type = "image/jpeg"  # По умолчанию
-                if image_data.startswith(b'\x89PNG'):
-                    mime_type = "image/png"
-                elif image_data.startswith(b'GIF'):
-                    mime_type = "image/gif"
-                elif image_data.startswith(b'RIFF') and b'WEBP' in image_data[:20]:
-                    mime_type = "image/webp"
-                
-                content_parts.append({
+                mime_type = self._image_mime_type(image_data)
+                image_parts_by_digest[digest] = (mime_type, {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:{mime_type};base64,{image_base64}"
+                        "url": _image_data_url(mime_type, image_base64)
                     }
                 })
-                logger.info(f"Добавлено изображение {idx + 1}/{len(images_list)} ({mime_type})")
+            
+            added_digests = set()
+            for idx, digest in enumerate(digests):
+                mime_type, image_part = image_parts_by_digest[digest]
+                content_parts.append(image_part)
+                if digest in added_digests:
+                    logger.info(f"Добавлено изображение {idx + 1}/{len(images_list)} (повтор, base64 переиспользован)")
+                else:
+                    added_digests.add(digest)
+                    logger.info(f"Добавлено изображение {idx + 1}/{len(images_list)} ({mime_type})")
             
             data = {
                 "model": api_config["model"],
@@ -4748,17 +5036,13 @@ class TelegramWhisperBot:
             }
             
             logger.info(f"Отправляю запрос на обработку {len(images_list)} изображений в API с моделью {api_config['model']}")
-            response = requests.post(
-                api_config["url"],
-                headers=headers,
-                json=data,
-                timeout=300
-            )
+            status, _, raw = await self._post_json(api_config["url"], api_config["key"], data)
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Получен ответ от API, обрабатываю...")
-                logger.info(f"Ответ API (mergeimage): {self._format_api_result_for_log(result)}")
+            if status == 200:
+                result = _json_loads(raw)
+                logger.info("Получен ответ от API, обрабатываю...")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Ответ API (mergeimage): %s", self._format_api_result_for_log(result))
                 
                 # Проверяем наличие ошибок в ответе
                 has_error, error_type, should_retry = self._check_api_response_error(result)
@@ -4768,72 +5052,9 @@ class TelegramWhisperBot:
                     logger.error(error_msg)
                     return {'error': error_msg}
                 
-                # Проверяем различные форматы ответа
-                if 'choices' in result and len(result['choices']) > 0:
-                    choice = result['choices'][0]
-                    
-                    # Проверяем формат с images в message
-                    if 'message' in choice:
-                        message = choice['message']
-                        
-                        # Формат: choices[0].message.images[0].image_url.url (сгенерированное изображение)
-                        if 'images' in message and isinstance(message['images'], list) and len(message['images']) > 0:
-                            image_obj = message['images'][0]
-                            if 'image_url' in image_obj and 'url' in image_obj['image_url']:
-                                image_url = image_obj['image_url']['url']
-                                
-                                # Проверяем, это base64 data URL или обычный URL
-                                if image_url.startswith('data:image/'):
-                                    logger.info("Изображение получено в формате base64, декодирую...")
-                                    match = re.match(r'data:image/(\w+);base64,(.+)', image_url)
-                                    if match:
-                                        image_format = match.group(1)
-                                        base64_data = match.group(2)
-                                        image_bytes = base64.b64decode(base64_data)
-                                        logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                        return {
-                                            'data': image_bytes,
-                                            'format': image_format
-                                        }
-                                else:
-                                    # Обычный HTTP URL
-                                    logger.info("Изображение успешно обработано через OpenRouter (URL)")
-                                    return {'url': image_url}
-                        
-                        # Проверяем message.content (текстовый ответ или base64)
-                        if 'content' in message:
-                            content = message['content']
-                            
-                            # Если content - это data URL с base64
-                            if isinstance(content, str) and content.startswith('data:image/'):
-                                logger.info("Изображение получено в message.content в формате base64, декодирую...")
-                                match = re.match(r'data:image/(\w+);base64,(.+)', content)
-                                if match:
-                                    image_format = match.group(1)
-                                    base64_data = match.group(2)
-                                    image_bytes = base64.b64decode(base64_data)
-                                    logger.info(f"Изображение успешно декодировано, формат: {image_format}, размер: {len(image_bytes)} байт")
-                                    return {
-                                        'data': image_bytes,
-                                        'format': image_format
-                                    }
-                            
-                            # Если content - это обычный HTTP URL
-                            if isinstance(content, str) and (content.startswith('http://') or content.startswith('https://')):
-                                logger.info("Изображение успешно обработано через OpenRouter (URL в content)")
-                                return {'url': content}
-                            
-                            # Если content - это текст с встроенным URL
-                            url_match = re.search(r'(https?://[^\s]+)', content)
-                            if url_match:
-                                image_url = url_match.group(1)
-                                logger.info("Изображение успешно обработано через OpenRouter (URL извлечен из текста)")
-                                return {'url': image_url}
-                            
-                            # Если это просто текстовое описание/ответ
-                            if isinstance(content, str) and len(content) > 0:
-                                logger.info("Получен текстовый ответ от API")
-                                return {'description': content}
+                image_result = self._extract_image_from_response(result, "обработано")
+                if image_result is not None:
+                    return image_result
                 
                 logger.error(
                     f"Неожиданный формат ответа от OpenRouter API (mergeimage): {self._format_api_result_for_log(result)}"
@@ -4841,49 +5062,185 @@ class TelegramWhisperBot:
                 return {'error': 'Неожиданный формат ответа от API'}
             else:
                 logger.error(
-                    f"Ошибка OpenRouter API: {response.status_code} - {self._truncate_http_error_body(response.text)}"
+                    f"Ошибка OpenRouter API: {status} - "
+                    f"{self._truncate_http_error_body(raw.decode('utf-8', errors='replace'))}"
                 )
-                return {'error': f'Ошибка API: {response.status_code}'}
+                return {'error': f'Ошибка API: {status}'}
                 
         except Exception as e:
             logger.error(f"Ошибка при обработке нескольких изображений через OpenRouter: {e}")
             return {'error': str(e)}
     
+    def _read_transcript_file(self, transcript_file: Path) -> str:
+        """Читает файл транскрипции Whisper за одно чтение с диска и декодирует в памяти.
+
+        Сначала UTF-8 (с BOM или без), затем кодировка, определённая charset_normalizer,
+        и в крайнем случае UTF-8 с заменой нечитаемых символов.
+        """
+        raw = transcript_file.read_bytes()
+        try:
+            transcript = raw.decode('utf-8-sig')
+            logger.info("Транскрипция успешно создана (кодировка: utf-8)")
+            return transcript
+        except UnicodeDecodeError:
+            pass
+        
+        # Кодировку определяем по байтам (charset_normalizer ставится вместе с requests)
+        try:
+            from charset_normalizer import from_bytes
+            best = from_bytes(raw).best()
+        except ImportError:
+            best = None
+        
+        if best is not None:
+            logger.info(f"Транскрипция успешно создана (кодировка: {best.encoding})")
+            return str(best)
+        
+        transcript = raw.decode('utf-8', errors='replace')
+        logger.info("Транскрипция создана с заменой нечитаемых символов")
+        return transcript
+    
+    def _read_log_tail(self, log_file: Path, max_bytes: int = 8192) -> bytes:
+        """Читает последние max_bytes байт лога Whisper (пустые байты, если файла нет)."""
+        try:
+            with open(log_file, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - max_bytes))
+                return f.read()
+        except OSError:
+            return b""
+    
+    def _use_faster_whisper(self) -> bool:
+        """Транскрибировать ли в процессе через faster-whisper вместо запуска whisper.exe."""
+        return self.config.get("whisper_backend", "cli") == "faster-whisper"
+
+    def _get_whisper_model(self):
+        """Возвращает модель faster-whisper, загружая её при первом обращении (блокирующий вызов)."""
+        with self._whisper_model_lock:
+            if self._whisper_model is None:
+                from faster_whisper import WhisperModel
+
+                model_name = self.config.get("whisper_model", "turbo")
+                device = self.config.get("whisper_device", "auto")
+                batch_size = int(self.config.get("whisper_batch_size", 0))
+                vad = bool(self.config.get("whisper_vad", True))
+                if batch_size > 0 and not vad:
+                    # BatchedInferencePipeline режет аудио на фрагменты по VAD: без него записи
+                    # длиннее 30 секунд падают с "No clip timestamps found"
+                    logger.warning("whisper_vad=false несовместим с whisper_batch_size > 0, VAD-фильтр включён")
+                    vad = True
+                # Квантование: int8-веса с fp16-активациями на GPU, чистый int8 на CPU
+                compute_type = self.config.get("whisper_compute_type")
+                if not compute_type:
+                    if device == "auto":
+                        import ctranslate2
+                        on_gpu = ctranslate2.get_cuda_device_count() > 0
+                    else:
+                        on_gpu = device == "cuda"
+                    compute_type = "int8_float16" if on_gpu else "int8"
+                logger.info(
+                    f"Загружаю модель faster-whisper: {model_name} "
+                    f"(device={device}, compute_type={compute_type}, batch_size={batch_size})"
+                )
+                model = WhisperModel(model_name, device=device, compute_type=compute_type)
+                if batch_size > 0:
+                    # Батчевый режим: фрагменты аудио (по VAD) декодируются пачками, GPU загружен полностью
+                    from faster_whisper import BatchedInferencePipeline
+                    model = BatchedInferencePipeline(model=model)
+                self._whisper_batch_size = batch_size
+                self._whisper_vad = vad
+                self._whisper_model = model
+            return self._whisper_model
+
+    async def _transcribe_with_faster_whisper(self, audio_file: Path, progress_message=None) -> Optional[str]:
+        """Транскрибирует аудио моделью faster-whisper в процессе бота, без subprocess и .txt файла"""
+        model = await asyncio.to_thread(self._get_whisper_model)
+        transcribe_kwargs = {
+            "beam_size": 5,
+            # Silero VAD (ONNX, встроен в faster-whisper) отбрасывает тишину и музыку до декодирования
+            "vad_filter": self._whisper_vad,
+        }
+        if self._whisper_batch_size > 0:
+            transcribe_kwargs["batch_size"] = self._whisper_batch_size
+        # transcribe возвращает ленивый генератор сегментов — декодирование идёт по мере итерации
+        segments, info = await asyncio.to_thread(model.transcribe, str(audio_file), **transcribe_kwargs)
+        segments = iter(segments)
+
+        transcript_lines = []
+        last_progress = 0.0
+        loop = asyncio.get_running_loop()
+        last_status_time = 0.0
+
+        while True:
+            segment = await asyncio.to_thread(next, segments, None)
+            if segment is None:
+                break
+
+            text = segment.text.strip()
+            if text:
+                transcript_lines.append(text)
+
+            if progress_message and info.duration > 0:
+                progress = min(segment.end / info.duration, 1.0)
+                now = loop.time()
+                if progress - last_progress > 0.05 and now - last_status_time >= 1.0:
+                    last_progress = progress
+                    last_status_time = now
+                    progress_bar = self.create_progress_bar(progress)
+                    await self.update_status(progress_message, f"🎤 Создаю транскрипт... {progress_bar}")
+                    logger.info(f"Прогресс транскрипции: {progress * 100:.1f}%")
+
+        logger.info(f"Транскрипция faster-whisper завершена: {len(transcript_lines)} сегментов")
+        return '\n'.join(transcript_lines)
+
     async def transcribe_audio_with_progress(self, audio_file: Path, progress_message) -> Optional[str]:
         """Транскрибирует аудио с отображением прогресса"""
+        job_dir = None
         try:
             # Проверяем, что файл существует и не пустой
             if not audio_file.exists() or audio_file.stat().st_size == 0:
                 logger.error("Аудио файл не существует или пустой")
                 return None
             
+            if self._use_faster_whisper():
+                return await self._transcribe_with_faster_whisper(audio_file, progress_message)
+            
             # Получаем длительность аудио
             total_duration = self.get_audio_duration(audio_file)
             
+            # Отдельная папка задачи: имя файла транскрипции детерминировано,
+            # и параллельные запросы не подхватывают чужие файлы
+            job_dir = self.temp_dir / audio_file.stem
+            job_dir.mkdir(exist_ok=True)
+            
             # Команда whisper
             cmd = [
                 str(Path(self.config["whisper_path"]) / "whisper.exe"),
                 str(audio_file),
-                "--model", "turbo"
+                "--model", "turbo",
+                "--output_dir", str(job_dir),
+                "--output_format", "txt"
             ]
             
             logger.info(f"Выполняю команду: {' '.join(cmd)}")
             
-            # Выполняем команду с установкой кодировки UTF-8
-            env = os.environ.copy()
-            env['PYTHONIOENCODING'] = 'utf-8'
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=str(self.temp_dir),
-                env=env
-            )
+            # Выполняем команду с установкой кодировки UTF-8.
+            # stderr пишется в файл: пайп не переполняется, пока читаем stdout, а в память попадает только хвост лога
+            log_file = job_dir / "whisper.log"
+            with open(log_file, 'wb') as log_handle:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=log_handle,
+                    cwd=str(self.temp_dir),
+                    env=self._whisper_env
+                )
             
             # Читаем вывод построчно для отслеживания прогресса
             transcript_lines = []
             last_progress = 0.0
+            loop = asyncio.get_running_loop()
+            last_status_time = 0.0
             
             while True:
                 line = await process.stdout.readline()
@@ -4894,174 +5251,148 @@ class TelegramWhisperBot:
                 if line_str:
                     transcript_lines.append(line_str)
                     
-                    # Если есть длительность и строка содержит таймкод, обновляем прогресс
-                    if total_duration > 0 and '[' in line_str and '-->' in line_str:
+                    # Если есть длительность и строка начинается с таймкода, обновляем прогресс
+                    if total_duration > 0 and line_str[0] == '[':
                         current_time = self.parse_whisper_timestamp(line_str)
                         if current_time > 0:
                             progress = min(current_time / total_duration, 1.0)
                             
-                            # Обновляем прогресс только если он изменился значительно
-                            if progress - last_progress > 0.05:  # Обновляем каждые 5%
+                            # Обновляем прогресс только если он изменился значительно (каждые 5%)
+                            # и не чаще раза в секунду — быстрый Whisper не упирается в лимиты Telegram на edit
+                            now = loop.time()
+                            if progress - last_progress > 0.05 and now - last_status_time >= 1.0:
                                 last_progress = progress
+                                last_status_time = now
                                 progress_bar = self.create_progress_bar(progress)
                                 status_text = f"🎤 Создаю транскрипт... {progress_bar}"
                                 await self.update_status(progress_message, status_text)
-                                logger.info(f"Прогресс транскрипции: {progress:.1f}%")
+                                logger.info(f"Прогресс транскрипции: {progress * 100:.1f}%")
             
             # Ждем завершения процесса
             await process.wait()
             
-            # Читаем stderr для ошибок
-            stderr_data = await process.stderr.read()
-            if stderr_data:
-                stderr_text = stderr_data.decode('utf-8', errors='replace')
+            # Читаем хвост stderr для ошибок
+            stderr_tail = self._read_log_tail(log_file)
+            stderr_text = stderr_tail.decode('utf-8', errors='replace')
+            if stderr_text:
                 logger.info(f"Whisper stderr: {stderr_text}")
             
             if process.returncode != 0:
-                logger.error(f"Ошибка whisper: {stderr_text if 'stderr_text' in locals() else 'Неизвестная ошибка'}")
+                logger.error(f"Ошибка whisper: {stderr_text or 'Неизвестная ошибка'}")
                 return None
             
             # Проверяем, что Whisper не пропустил файл
-            if "Skipping" in ' '.join(transcript_lines) or "Failed to load audio" in (stderr_text if 'stderr_text' in locals() else ""):
+            if _WHISPER_FAIL_RE.search(stderr_tail) or any("Skipping" in ln for ln in transcript_lines):
                 logger.error("Whisper не смог обработать аудио файл")
                 return None
             
-            # Ищем созданный файл с транскрипцией
-            transcript_file = audio_file.with_suffix('.txt')
-            
-            # Если файл не найден, ищем все .txt файлы в папке
-            if not transcript_file.exists():
-                txt_files = list(self.temp_dir.glob("*.txt"))
-                if txt_files:
-                    transcript_file = txt_files[0]
-                    logger.info(f"Найден файл транскрипции: {transcript_file}")
+            # Whisper создает <имя аудио>.txt в папке задачи
+            transcript_file = job_dir / f"{audio_file.stem}.txt"
             
             if transcript_file.exists():
                 try:
-                    # Пробуем разные кодировки
-                    for encoding in ['utf-8', 'utf-8-sig', 'cp1251', 'latin1']:
-                        try:
-                            with open(transcript_file, 'r', encoding=encoding) as f:
-                                transcript = f.read()
-                            logger.info(f"Транскрипция успешно создана (кодировка: {encoding})")
-                            return transcript
-                        except UnicodeDecodeError:
-                            continue
-                    
-                    # Если все кодировки не подошли, читаем как байты и декодируем с ошибками
-                    with open(transcript_file, 'rb') as f:
-                        content = f.read()
-                    transcript = content.decode('utf-8', errors='replace')
-                    logger.info("Транскрипция создана с заменой нечитаемых символов")
-                    return transcript
-                    
+                    return self._read_transcript_file(transcript_file)
                 except Exception as e:
                     logger.error(f"Ошибка при чтении файла транскрипции: {e}")
                     return None
             else:
                 logger.error("Файл транскрипции не был создан")
-                files_in_dir = list(self.temp_dir.glob("*"))
-                logger.error(f"Файлы в папке: {[f.name for f in files_in_dir]}")
+                files_in_dir = [f.name for f in itertools.islice(job_dir.iterdir(), 50)]
+                logger.error(f"Файлы в папке (до 50): {files_in_dir}")
                 return None
                 
         except Exception as e:
             logger.error(f"Ошибка при транскрипции: {e}")
             return None
+        finally:
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
     
     async def transcribe_audio(self, audio_file: Path) -> Optional[str]:
         """Транскрибирует аудио используя OpenAI Whisper (без прогресса)"""
+        job_dir = None
         try:
             # Проверяем, что файл существует и не пустой
             if not audio_file.exists() or audio_file.stat().st_size == 0:
                 logger.error("Аудио файл не существует или пустой")
                 return None
             
+            if self._use_faster_whisper():
+                return await self._transcribe_with_faster_whisper(audio_file)
+            
+            # Отдельная папка задачи: имя файла транскрипции детерминировано,
+            # и параллельные запросы не подхватывают чужие файлы
+            job_dir = self.temp_dir / audio_file.stem
+            job_dir.mkdir(exist_ok=True)
+            
             # Команда whisper
             cmd = [
                 str(Path(self.config["whisper_path"]) / "whisper.exe"),
                 str(audio_file),
-                "--model", "turbo"
+                "--model", "turbo",
+                "--output_dir", str(job_dir),
+                "--output_format", "txt"
             ]
             
             logger.info(f"Выполняю команду: {' '.join(cmd)}")
             
-            # Выполняем команду с установкой кодировки UTF-8
-            env = os.environ.copy()
-            env['PYTHONIOENCODING'] = 'utf-8'
-            
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-                cwd=str(self.temp_dir),
-                env=env
-            )
+            # Выполняем команду с установкой кодировки UTF-8.
+            # stdout (весь текст транскрипта) и stderr пишутся в файл, в память попадает только хвост лога
+            log_file = job_dir / "whisper.log"
+            with open(log_file, 'wb') as log_handle:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=log_handle,
+                    stderr=asyncio.subprocess.STDOUT,
+                    cwd=str(self.temp_dir),
+                    env=self._whisper_env
+                )
             
-            stdout, stderr = await process.communicate()
+            await process.wait()
             
-            # Логируем вывод для отладки
-            if stdout:
-                logger.info(f"Whisper stdout: {stdout.decode()}")
-            if stderr:
-                logger.info(f"Whisper stderr: {stderr.decode()}")
+            # Логируем хвост вывода для отладки
+            output_tail = self._read_log_tail(log_file)
+            output_text = output_tail.decode('utf-8', errors='replace')
+            if output_text:
+                logger.info(f"Whisper output: {output_text}")
             
             if process.returncode != 0:
-                logger.error(f"Ошибка whisper: {stderr.decode()}")
+                logger.error(f"Ошибка whisper: {output_text}")
                 return None
             
-            # Проверяем, что Whisper не пропустил файл
-            if "Skipping" in stdout.decode() or "Failed to load audio" in stderr.decode():
+            # Проверяем, что Whisper не пропустил файл (сообщения об ошибке — в конце вывода)
+            if _WHISPER_FAIL_RE.search(output_tail):
                 logger.error("Whisper не смог обработать аудио файл")
                 return None
             
-            # Ищем созданный файл с транскрипцией
-            # Whisper создает файл с расширением .txt в той же папке
-            transcript_file = audio_file.with_suffix('.txt')
-            
-            # Если файл не найден, ищем все .txt файлы в папке
-            if not transcript_file.exists():
-                txt_files = list(self.temp_dir.glob("*.txt"))
-                if txt_files:
-                    transcript_file = txt_files[0]  # Берем первый найденный .txt файл
-                    logger.info(f"Найден файл транскрипции: {transcript_file}")
+            # Whisper создает <имя аудио>.txt в папке задачи
+            transcript_file = job_dir / f"{audio_file.stem}.txt"
             
             if transcript_file.exists():
                 try:
-                    # Пробуем разные кодировки
-                    for encoding in ['utf-8', 'utf-8-sig', 'cp1251', 'latin1']:
-                        try:
-                            with open(transcript_file, 'r', encoding=encoding) as f:
-                                transcript = f.read()
-                            logger.info(f"Транскрипция успешно создана (кодировка: {encoding})")
-                            return transcript
-                        except UnicodeDecodeError:
-                            continue
-                    
-                    # Если все кодировки не подошли, читаем как байты и декодируем с ошибками
-                    with open(transcript_file, 'rb') as f:
-                        content = f.read()
-                    transcript = content.decode('utf-8', errors='replace')
-                    logger.info("Транскрипция создана с заменой нечитаемых символов")
-                    return transcript
-                    
+                    return self._read_transcript_file(transcript_file)
                 except Exception as e:
                     logger.error(f"Ошибка при чтении файла транскрипции: {e}")
                     return None
             else:
                 logger.error("Файл транскрипции не был создан")
                 # Выводим содержимое папки для отладки
-                files_in_dir = list(self.temp_dir.glob("*"))
-                logger.error(f"Файлы в папке: {[f.name for f in files_in_dir]}")
+                files_in_dir = [f.name for f in itertools.islice(job_dir.iterdir(), 50)]
+                logger.error(f"Файлы в папке (до 50): {files_in_dir}")
                 return None
                 
         except Exception as e:
             logger.error(f"Ошибка при транскрипции: {e}")
             return None
+        finally:
+            if job_dir is not None:
+                shutil.rmtree(job_dir, ignore_errors=True)
     
-    async def create_summary(self, transcript: str) -> Optional[str]:
-        """Создает summary используя настроенный API"""
+    async def create_summary(self, transcript: str, api_config: Optional[dict] = None) -> Optional[str]:
+        """Создает summary используя настроенный (или явно переданный) OpenAI-совместимый API"""
         try:
-            api_config = self.get_api_config("summary_api")
+            if api_config is None:
+                api_config = self.get_api_config("summary_api")
             url = api_config["url"]
             headers = {
                 "Authorization": f"Bearer {api_config['key']}",
@@ -5085,10 +5416,13 @@ class TelegramWhisperBot:
             
             logger.info(f"Отправляю запрос к API (модель: {api_config['model']})")
             
-            response = requests.post(url, headers=headers, json=data, timeout=300)  # 5 минут
+            # Запрос идёт минутами — уводим его в пул потоков, event loop продолжает обслуживать чаты
+            response = await asyncio.to_thread(
+                self.http.post, url, headers=headers, data=_json_dumps(data), timeout=300  # 5 минут
+            )
             response.raise_for_status()
             
-            result = response.json()
+            result = _json_loads(response.content)
             summary = result["choices"][0]["message"]["content"]
             
             logger.info("Summary успешно создан")
@@ -5098,15 +5432,18 @@ class TelegramWhisperBot:
             logger.error(f"Ошибка при создании summary: {e}")
             return None
     
-    async def create_summary_with_gemini(self, youtube_url: str, api_config: dict) -> Optional[str]:
+    async def create_summary_with_gemini(self, youtube_url: str, api_config: dict, on_progress=None) -> Optional[str]:
         """Создаёт summary YouTube-видео напрямую через Google Gemini API.
         
         Gemini принимает YouTube URL через file_data.file_uri и самостоятельно
         анализирует аудио и видеоряд — без необходимости скачивать и транскрибировать.
+        Ответ читается потоком (streamGenerateContent, SSE), поэтому уже написанную
+        часть summary можно показывать пользователю, не дожидаясь конца генерации.
         
         Args:
             youtube_url: Ссылка на YouTube-видео
             api_config: Конфигурация Google Gemini API (url, key, model)
+            on_progress: async-колбэк, получает накопленный текст (не чаще раза в 1.5 секунды)
         
         Returns:
             str: Текст summary или None в случае ошибки
@@ -5116,7 +5453,7 @@ class TelegramWhisperBot:
             api_key = api_config["key"]
             base_url = api_config.get("url", "https://generativelanguage.googleapis.com/v1beta")
             
-            url = f"{base_url}/models/{model}:generateContent"
+            url = f"{base_url}/models/{model}:streamGenerateContent?alt=sse"
             
             headers = {
                 "Content-Type": "application/json",
@@ -5151,37 +5488,56 @@ class TelegramWhisperBot:
             }
             
             logger.info(f"Отправляю YouTube URL в Google Gemini API (модель: {model}): {youtube_url}")
-            response = requests.post(url, headers=headers, json=data, timeout=600)  # 10 минут — видео может быть длинным
+            # Запрос идёт минутами — уводим его в пул потоков, event loop продолжает обслуживать чаты
+            response = await asyncio.to_thread(
+                self.http.post, url, headers=headers, data=_json_dumps(data),
+                timeout=600, stream=True  # 10 минут — видео может быть длинным
+            )
             
-            if response.status_code == 200:
-                result = response.json()
-                logger.info(f"Ответ Gemini API получен")
-                
-                candidates = result.get("candidates", [])
-                if not candidates:
-                    # Проверяем promptFeedback на блокировку
-                    feedback = result.get("promptFeedback", {})
-                    block_reason = feedback.get("blockReason", "")
-                    if block_reason:
-                        logger.error(f"Запрос заблокирован Gemini: {block_reason}")
-                        return None
-                    logger.error(f"Пустой ответ от Gemini API: {result}")
+            with response:
+                if response.status_code != 200:
+                    logger.error(f"Ошибка Google Gemini API: {response.status_code} - {response.text}")
                     return None
                 
-                parts = candidates[0].get("content", {}).get("parts", [])
-                text_parts = [p["text"] for p in parts if "text" in p]
-                summary = "\n".join(text_parts)
+                # Каждое SSE-событие "data: {...}" — очередной фрагмент GenerateContentResponse
+                lines = response.iter_lines()
+                text_parts = []
+                block_reason = ""
+                loop = asyncio.get_running_loop()
+                last_progress_time = loop.time()
                 
-                if summary:
-                    logger.info(f"Summary успешно создан через Google Gemini ({len(summary)} символов)")
-                    return summary
-                else:
-                    logger.error("Gemini вернул ответ без текста")
-                    return None
+                while True:
+                    line = await asyncio.to_thread(next, lines, None)
+                    if line is None:
+                        break
+                    if not line.startswith(b'data:'):
+                        continue
+                    
+                    event = _json_loads(line[5:].strip())
+                    # Проверяем promptFeedback на блокировку
+                    block_reason = event.get("promptFeedback", {}).get("blockReason", "") or block_reason
+                    candidates = event.get("candidates", [])
+                    if candidates:
+                        parts = candidates[0].get("content", {}).get("parts", [])
+                        text_parts.extend(p["text"] for p in parts if "text" in p)
+                    
+                    if on_progress and text_parts:
+                        now = loop.time()
+                        if now - last_progress_time >= 1.5:
+                            last_progress_time = now
+                            await on_progress("".join(text_parts))
+            
+            logger.info(f"Ответ Gemini API получен")
+            summary = "".join(text_parts)
+            
+            if summary:
+                logger.info(f"Summary успешно создан через Google Gemini ({len(summary)} символов)")
+                return summary
+            if block_reason:
+                logger.error(f"Запрос заблокирован Gemini: {block_reason}")
             else:
-                error_text = response.text
-                logger.error(f"Ошибка Google Gemini API: {response.status_code} - {error_text}")
-                return None
+                logger.error("Gemini вернул ответ без текста")
+            return None
                 
         except requests.exceptions.Timeout:
             logger.error("Таймаут при запросе к Google Gemini API (видео слишком длинное?)")
@@ -5190,13 +5546,24 @@ class TelegramWhisperBot:
             logger.error(f"Ошибка при создании summary через Gemini: {e}")
             return None
     
+    def _remove_temp_files(self) -> int:
+        """Удаляет файлы из временной папки (блокирующий вызов), возвращает их число.
+
+        os.scandir отдаёт тип записи без отдельного stat на каждый файл,
+        а сами unlink выполняются параллельно в небольшом пуле потоков.
+        """
+        with os.scandir(self.temp_dir) as entries:
+            paths = [entry.path for entry in entries if entry.is_file()]
+        if paths:
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(os.unlink, paths))
+        return len(paths)
+
     async def cleanup_temp_files(self):
         """Очищает временные файлы"""
         try:
-            for file_path in self.temp_dir.glob("*"):
-                if file_path.is_file():
-                    file_path.unlink()
-            logger.info("Временные файлы очищены")
+            removed = await asyncio.to_thread(self._remove_temp_files)
+            logger.info(f"Временные файлы очищены ({removed} шт.)")
         except Exception as e:
             logger.error(f"Ошибка при очистке временных файлов: {e}")
 
@@ -5504,11 +5871,11 @@ class TelegramWhisperBot:
                 "temperature": 0,
             }
 
-            response = requests.post(url, headers=headers, json=data, timeout=15)
+            response = await asyncio.to_thread(self.http.post, url, headers=headers, json=data, timeout=15)
             if response.status_code != 200:
                 logger.warning(f"_check_fighter_duplicate: API вернул {response.status_code}, пропускаем проверку")
                 return False
-            result = response.json()
+            result = _json_loads(response.content)
 
             answer = result["choices"][0]["message"]["content"].strip().upper()
             logger.info(f"_check_fighter_duplicate: '{new_fighter}' vs {existing_fighters} → {answer}")
@@ -6938,19 +7305,13 @@ class TelegramWhisperBot:
             )
             logger.info("Telegram Bot API: %s", tg_api["api_root"])
 
-            # Удаляем webhook, если он установлен
-            try:
-                import requests
-                webhook_url = f"{tg_api['base_url']}{self.config['telegram_token']}/deleteWebhook"
-                requests.post(webhook_url, timeout=10)
-                logger.info("Webhook удален")
-            except Exception as e:
-                logger.warning(f"Не удалось удалить webhook: {e}")
-            
             # Загружаем список моделей при старте
             logger.info("Загружаю список моделей OpenRouter...")
             self.fetch_openrouter_models()
             
+            # Прогреваем соединения к остальным API в фоне, не задерживая старт polling
+            threading.Thread(target=self._prewarm_http_connections, daemon=True).start()
+            
             # Настраиваем обработчики
             self.setup_handlers()
             
@@ -7068,6 +7429,7 @@ class TelegramWhisperBot:
 
             # Запускаем бота
             logger.info("Запускаю Telegram бота...")
+            # run_polling сам удаляет webhook (deleteWebhook с drop_pending_updates) через клиент PTB
             self.application.run_polling(
                 stop_signals=None,
                 drop_pending_updates=True,
@@ -7093,12 +7455,11 @@ def main():
     finally:
         # Очищаем временные файлы при завершении
         if bot:
+            bot.http.close()
             try:
-                # Синхронная очистка временных файлов
-                for file_path in bot.temp_dir.glob("*"):
-                    if file_path.is_file():
-                        file_path.unlink()
-                logger.info("Временные файлы очищены")
+                # Синхронная очистка временных файлов: event loop к этому моменту уже остановлен
+                removed = bot._remove_temp_files()
+                logger.info(f"Временные файлы очищены ({removed} шт.)")
             except Exception as e:
                 logger.error(f"Ошибка при очистке временных файлов: {e}")
 
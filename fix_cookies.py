@@ -15,30 +15,44 @@ def fix_cookies_file(cookies_file: str):
     print(f"🔧 Исправляю файл cookies: {cookies_file}")
     
     try:
-        # Пробуем разные кодировки
-        for encoding in ['utf-8', 'cp1251', 'latin1', 'iso-8859-1', 'windows-1252']:
+        # Читаем файл один раз и декодируем в памяти
+        with open(cookies_file, 'rb') as f:
+            raw = f.read()
+        
+        # Формат Netscape cookies.txt — чистый ASCII; такой файл уже годится для yt-dlp, перезапись не нужна
+        if raw.isascii():
+            print("✅ Cookies файл уже в порядке (ASCII), исправление не требуется")
+            return True
+        
+        try:
+            content = raw.decode('utf-8')
+            encoding = 'utf-8'
+        except UnicodeDecodeError:
+            # Кодировку определяем по байтам (charset_normalizer ставится вместе с requests)
             try:
-                with open(cookies_file, 'r', encoding=encoding) as f:
-                    content = f.read()
-                
-                # Если файл успешно прочитан, сохраняем в UTF-8
-                with open(cookies_file, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                
-                print(f"✅ Cookies файл исправлен! (исходная кодировка: {encoding})")
-                return True
-                
-            except UnicodeDecodeError:
-                continue
+                from charset_normalizer import from_bytes
+                best = from_bytes(raw).best()
+            except ImportError:
+                best = None
+            
+            if best is not None:
+                content = str(best)
+                encoding = best.encoding
+            else:
+                content = None
         
-        # Если все кодировки не подошли, читаем как байты
-        print("⚠️  Не удалось определить кодировку, читаю как байты...")
+        if content is not None:
+            # Сохраняем в UTF-8
+            with open(cookies_file, 'w', encoding='utf-8') as f:
+                f.write(content)
+            
+            print(f"✅ Cookies файл исправлен! (исходная кодировка: {encoding})")
+            return True
         
-        with open(cookies_file, 'rb') as f:
-            content = f.read()
+        # Если кодировку определить не удалось, декодируем с заменой нечитаемых символов
+        print("⚠️  Не удалось определить кодировку, читаю как байты...")
         
-        # Декодируем с заменой нечитаемых символов
-        text_content = content.decode('utf-8', errors='replace')
+        text_content = raw.decode('utf-8', errors='replace')
         
         with open(cookies_file, 'w', encoding='utf-8') as f:
             f.write(text_content)